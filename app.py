@@ -1,19 +1,12 @@
 import streamlit as st
 import numpy as np
-import pandas as pd
-from PIL import Image
-import plotly.express as px
-import plotly.graph_objects as go
-from plotly.subplots import make_subplots
 import os
 import time
 
-# Import our enhanced components
-from utils.shaders import get_shader_background
-from utils.canvas_flame import get_canvas_flame
-from utils.polarization import PolarizationProcessor
-from utils.visualization import PolarizationVisualizer
-from utils.file_handling import FileExporter
+# Import our enhanced components. Pages import the plotting, pandas and SciPy-backed
+# modules themselves so cold starts and reruns of other pages never pay for them.
+from utils.assets import inject_static_assets
+from utils.canvas_flame import FLAME_FPS_CHOICES, FLAME_MAX_FPS
 
 # Page configuration - MUST BE FIRST
 st.set_page_config(
@@ -23,10 +16,131 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
-# Apply WebGL shader background
-st.markdown(get_shader_background(), unsafe_allow_html=True)
-# Add flame-like canvas background
-st.markdown(get_canvas_flame(), unsafe_allow_html=True)
+# Apply WebGL shader background and flame canvas (once per session)
+inject_static_assets(st.session_state.get("flame_fps", FLAME_MAX_FPS))
+
+
+def get_upload_spooler():
+    """Per-session spooler; its temp directory is removed when the session state is dropped"""
+    from utils.uploads import UploadSpooler
+    
+    if "upload_spooler" not in st.session_state:
+        st.session_state.upload_spooler = UploadSpooler()
+    return st.session_state.upload_spooler
+
+
+def upload_key(file):
+    """Identity of an upload across reruns"""
+    return getattr(file, 'file_id', file.name)
+
+
+def drop_refinement():
+    """Cancel the full-resolution job, if any, and forget it so its memory budget is released"""
+    current = st.session_state.pop("refinement", None)
+    if current is not None:
+        current[1].cancel()
+
+
+def get_refinement_job(uploaded_files, align_frames, mask_options=None, mask_signature=None):
+    """Return the full-resolution job for these uploads, cancelling any job for earlier ones"""
+    from utils.progressive import RefinementJob
+    
+    signature = (tuple(upload_key(file) for file in uploaded_files), align_frames, mask_signature)
+    current = st.session_state.get("refinement")
+    if current is not None and current[0] == signature:
+        return current[1]
+    drop_refinement()
+    
+    # Uploads are spilled to disk; uncompressed formats come back memory-mapped.
+    # Spools of earlier uploads are dropped (a cancelled job still mapping one keeps it readable)
+    spooler = get_upload_spooler()
+    spooler.retain(signature[0] + ((mask_signature[2],) if mask_signature else ()))
+    images = [spooler.load(file) for file in uploaded_files]
+    if len({img.shape for img in images}) > 1:
+        raise ValueError("All four images must have the same size, got " +
+                         ", ".join(f"{img.shape[1]}x{img.shape[0]}" for img in images))
+    user_mask = (mask_options or {}).get('user_mask')
+    if user_mask is not None and user_mask.shape != images[0].shape[:2]:
+        raise ValueError(f"The mask is {user_mask.shape[1]}x{user_mask.shape[0]} but the images are "
+                         f"{images[0].shape[1]}x{images[0].shape[0]}")
+    plan = plan_for(images, register=align_frames, mask_options=mask_options)
+    if plan.rejected:
+        return None
+    job = RefinementJob(images, align_frames, plan, mask_options)
+    st.session_state.refinement = (signature, job)
+    return job
+
+
+def mask_controls():
+    """Validity-mask settings; returns (options for compute_validity_mask, hashable signature)"""
+    with st.expander("🎭 Pixel mask — exclude dark, saturated or unwanted pixels"):
+        min_intensity = st.number_input(
+            "Minimum total intensity (S₀)", min_value=0.0, value=0.0, step=1.0, key="mask_min_intensity",
+            help="Pixels whose total intensity S₀ is at or below this are left out (shown as gaps)."
+        )
+        exclude_saturated = st.checkbox("Exclude saturated pixels", value=False, key="mask_saturation")
+        saturation_level = st.number_input(
+            "Saturation level", min_value=1.0, value=255.0, step=1.0, key="mask_saturation_level",
+            disabled=not exclude_saturated,
+            help="A pixel is dropped when any frame reaches this value."
+        )
+        mask_file = st.file_uploader(
+            "Region of interest (non-zero pixels are analysed)",
+            type=['png', 'jpg', 'jpeg', 'tif', 'tiff', 'bmp', 'npy'], key="mask_upload"
+        )
+    
+    options = {
+        'min_intensity': min_intensity,
+        'saturation_level': saturation_level if exclude_saturated else None,
+        'user_mask': None
+    }
+    mask_id = None
+    if mask_file is not None:
+        options['user_mask'] = get_upload_spooler().load(mask_file) != 0
+        mask_id = upload_key(mask_file)
+    return options, (options['min_intensity'], options['saturation_level'], mask_id)
+
+
+def get_run_history():
+    from utils.history import RunHistory
+    
+    if "run_history" not in st.session_state:
+        st.session_state.run_history = RunHistory()
+    return st.session_state.run_history
+
+
+def record_run(key, mode, stats_df, shape, file_names, mask=None, settings=None):
+    """Append a finished analysis to the run history, once per result however often the page reruns"""
+    import sqlite3
+    
+    recorded = st.session_state.setdefault("recorded_runs", set())
+    if key in recorded:
+        return
+    try:
+        get_run_history().record_run(
+            mode, stats_df.to_dict('records'), shape, file_names,
+            batch=st.session_state.get("batch_label", ""),
+            valid_fraction=1.0 if mask is None else float(mask.mean()),
+            settings=settings
+        )
+    except (sqlite3.Error, OSError) as exc:
+        st.warning(f"⚠️ This run was not saved to the history: {exc}")
+    recorded.add(key)
+
+
+def plan_for(images, register=False, mask_options=None):
+    """Memory plan for a job over these input frames"""
+    from utils.memory_planner import plan_job
+    
+    mask_options = mask_options or {}
+    return plan_job(
+        images[0].shape,
+        n_inputs=len(images),
+        input_itemsize=max(img.dtype.itemsize for img in images),
+        inputs_mapped=all(isinstance(img, np.memmap) for img in images),
+        register=register,
+        masked=mask_options.get('saturation_level') is not None or mask_options.get('user_mask') is not None
+    )
 
 
 def main():
@@ -85,12 +199,19 @@ def main():
         
         app_mode = st.radio(
             "Choose Analysis Mode",
-            ["🎯 Single Image Analysis", "🔄 Dual Image Analysis", "🚀 Demo Mode", "📚 Learn"],
+            ["🎯 Single Image Analysis", "🔄 Dual Image Analysis", "🚀 Demo Mode", "🗂️ History", "📚 Learn"],
             key="nav"
         )
         
         st.markdown("</div>", unsafe_allow_html=True)
         
+        st.text_input(
+            "🏷️ Batch / sample label",
+            key="batch_label",
+            placeholder="e.g. batch X",
+            help="Stored with every analysis in the run history so runs can be trended per batch."
+        )
+        
         # Quick stats
         st.markdown("""
         <div class='glass-card' style='padding: 1rem; margin-top: 1rem;'>
@@ -105,6 +226,20 @@ def main():
             </div>
         </div>
         """, unsafe_allow_html=True)
+        
+        st.selectbox(
+            "✨ Background animation",
+            FLAME_FPS_CHOICES,
+            index=FLAME_FPS_CHOICES.index(FLAME_MAX_FPS),
+            format_func=lambda fps: "Off" if not fps else f"Up to {fps:g} fps",
+            key="flame_fps",
+            help="The flame overlay lowers its own quality when frames run slow and pauses while the pointer is idle. "
+                 "Turn it off to leave all rendering time to the plots."
+        )
+    
+    if "Single Image Analysis" not in app_mode:
+        # The single-image uploads are discarded with their widget when another page is shown
+        drop_refinement()
     
     # Route to appropriate page
     if "Single Image Analysis" in app_mode:
@@ -113,6 +248,8 @@ def main():
         dual_image_analysis()
     elif "Demo Mode" in app_mode:
         demo_mode()
+    elif "History" in app_mode:
+        history_page()
     else:
         learn_page()
 
@@ -145,36 +282,85 @@ def single_image_analysis():
     
     uploaded_files = st.file_uploader(
         "",
-        type=['png', 'jpg', 'jpeg', 'tiff', 'bmp'],
+        type=['png', 'jpg', 'jpeg', 'tif', 'tiff', 'bmp', 'npy'],
         accept_multiple_files=True,
         key="single_upload",
         label_visibility="collapsed"
     )
     
+    align_frames = st.checkbox(
+        "🎯 Align 45°/90°/135° frames to the 0° frame (sub-pixel phase correlation)",
+        value=True,
+        key="align_frames",
+        help="Corrects small misalignment between sequentially captured frames, which otherwise shows up as false DOP at edges."
+    )
+    
+    if not uploaded_files or len(uploaded_files) != 4:
+        # Files were removed or added, so the running job no longer matches the uploads
+        drop_refinement()
+    
+    try:
+        mask_options, mask_signature = mask_controls()
+    except ValueError as exc:
+        st.error(f"❌ Mask: {exc}")
+        return
+    
     if uploaded_files and len(uploaded_files) == 4:
-        with st.spinner("🔮 Processing images with Stokes parameter analysis..."):
-            # Add processing animation
-            progress_bar = st.progress(0)
-            for i in range(100):
-                time.sleep(0.01)
-                progress_bar.progress(i + 1)
-            
-            images = []
-            file_names = []
-            
-            for file in uploaded_files:
-                img = Image.open(file).convert('L')
-                images.append(np.array(img, dtype=np.float32))
-                file_names.append(file.name)
-            
-            processor = PolarizationProcessor()
-            visualizer = PolarizationVisualizer()
-            exporter = FileExporter()
-            
-            stokes = processor.compute_stokes_single(images)
-            metrics = processor.compute_polarization_metrics(stokes)
+        from utils.file_handling import FileExporter
+        from utils.progressive import compute_preview
+        from utils.visualization import PolarizationVisualizer
+        
+        file_names = [file.name for file in uploaded_files]
+        try:
+            job = get_refinement_job(uploaded_files, align_frames, mask_options, mask_signature)
+        except ValueError as exc:
+            st.error(f"❌ {exc}")
+            return
+        if job is None:
+            images = [get_upload_spooler().load(file) for file in uploaded_files]
+            st.error(f"🚫 {plan_for(images, register=align_frames, mask_options=mask_options).message}")
+            return
+        if job.plan.message:
+            st.info(f"🧮 {job.plan.message}")
+        visualizer = PolarizationVisualizer()
+        exporter = FileExporter()
+        results = st.empty()
+        
+        if not job.done():
+            # Instant low-resolution pass while the full-resolution job runs in the background
+            with st.spinner("⚡ Computing preview..."):
+                preview_notices = []
+                preview_metrics, preview_mask, factor = compute_preview(job.images, align_frames, mask_options,
+                                                                        preview_notices.append)
+            with results.container():
+                for notice in preview_notices:
+                    st.warning(f"🎯 {notice}")
+                display_enhanced_results(job.images, preview_metrics, file_names, visualizer, exporter,
+                                         preview_factor=factor, mask=preview_mask)
             
-            display_enhanced_results(images, metrics, file_names, visualizer, exporter)
+            # Each progress update lets Streamlit interrupt this run when new files are uploaded
+            progress_bar = st.progress(0.0, text="🔮 Refining to full resolution...")
+            while not job.done():
+                time.sleep(0.1)
+                if job.queued:
+                    status = "⏳ Queued — waiting for memory held by other analyses..."
+                else:
+                    status = "🔮 Refining to full resolution..."
+                progress_bar.progress(job.progress, text=status)
+            progress_bar.empty()
+        
+        images, metrics, mask = job.result()
+        results.empty()
+        with results.container():
+            for notice in job.notices:
+                st.warning(f"🎯 {notice}")
+            stats_df = display_enhanced_results(images, metrics, file_names, visualizer, exporter, mask=mask)
+        # The uploaded resolution; binned plans return smaller frames
+        record_run(st.session_state.refinement[0], "single", stats_df, job.images[0].shape, file_names, mask,
+                   settings={'align': align_frames, 'plan': job.plan.mode, 'bin_factor': job.plan.bin_factor,
+                             'min_intensity': mask_options['min_intensity'],
+                             'saturation_level': mask_options['saturation_level'],
+                             'user_mask': mask_options['user_mask'] is not None})
             
     elif uploaded_files and len(uploaded_files) != 4:
         st.error("❌ Please upload exactly 4 images for comprehensive polarization analysis")
@@ -198,7 +384,7 @@ def dual_image_analysis():
             <p style='color: rgba(255,255,255,0.7); font-size: 0.9rem;'>Horizontal polarization</p>
         </div>
         """, unsafe_allow_html=True)
-        I0_file = st.file_uploader("Upload 0° image", type=['png', 'jpg', 'jpeg'], key="I0", label_visibility="collapsed")
+        I0_file = st.file_uploader("Upload 0° image", type=['png', 'jpg', 'jpeg', 'tif', 'tiff', 'bmp', 'npy'], key="I0", label_visibility="collapsed")
     
     with col2:
         st.markdown("""
@@ -207,35 +393,55 @@ def dual_image_analysis():
             <p style='color: rgba(255,255,255,0.7); font-size: 0.9rem;'>Vertical polarization</p>
         </div>
         """, unsafe_allow_html=True)
-        I90_file = st.file_uploader("Upload 90° image", type=['png', 'jpg', 'jpeg'], key="I90", label_visibility="collapsed")
+        I90_file = st.file_uploader("Upload 90° image", type=['png', 'jpg', 'jpeg', 'tif', 'tiff', 'bmp', 'npy'], key="I90", label_visibility="collapsed")
     
     if I0_file and I90_file:
+        from utils.file_handling import FileExporter
+        from utils.memory_planner import GLOBAL_BUDGET, PLOT_MAX_SIDE
+        from utils.progressive import analyse, downsample
+        from utils.visualization import PolarizationVisualizer
+        
+        spooler = get_upload_spooler()
+        spooler.retain([upload_key(I0_file), upload_key(I90_file)])
+        try:
+            I0 = spooler.load(I0_file)
+            I90 = spooler.load(I90_file)
+        except ValueError as exc:
+            st.error(f"❌ {exc}")
+            return
+        if I0.shape != I90.shape:
+            st.error(f"❌ The 0° image is {I0.shape[1]}x{I0.shape[0]} but the 90° image is {I90.shape[1]}x{I90.shape[0]}")
+            return
+        plan = plan_for([I0, I90])
+        if plan.rejected:
+            st.error(f"🚫 {plan.message}")
+            return
+        if plan.message:
+            st.info(f"🧮 {plan.message}")
+        
         with st.spinner("🔄 Processing dual-image analysis..."):
-            I0 = Image.open(I0_file).convert('L')
-            I0 = np.array(I0, dtype=np.float32)
-            
-            I90 = Image.open(I90_file).convert('L')
-            I90 = np.array(I90, dtype=np.float32)
-            
-            processor = PolarizationProcessor()
             visualizer = PolarizationVisualizer()
             
-            stokes = processor.compute_stokes_dual(I0, I90)
-            metrics = processor.compute_polarization_metrics(stokes)
+            with GLOBAL_BUDGET.reserve(plan.peak_bytes):
+                _images, metrics, _mask = analyse([I0, I90], False, plan)
+            stats_df = FileExporter.create_summary_statistics(metrics)
+            means = stats_df.set_index('Metric')['Mean']
+            record_run((upload_key(I0_file), upload_key(I90_file)), "dual", stats_df, I0.shape,
+                       [I0_file.name, I90_file.name], settings={'plan': plan.mode, 'bin_factor': plan.bin_factor})
             
             # Enhanced metrics display
             col1, col2, col3 = st.columns(3)
             with col1:
                 st.markdown(f"""
                 <div class='metric-card pulse-glow'>
-                    <h3 style='color: #00ff88; margin: 0;'>{np.mean(metrics['dop']):.3f}</h3>
+                    <h3 style='color: #00ff88; margin: 0;'>{means['dop']:.3f}</h3>
                     <p style='color: rgba(255,255,255,0.8); margin: 0;'>Degree of Polarization</p>
                 </div>
                 """, unsafe_allow_html=True)
             with col2:
                 st.markdown(f"""
                 <div class='metric-card'>
-                    <h3 style='color: #667eea; margin: 0;'>{np.mean(metrics['orientation_angle']):.1f}°</h3>
+                    <h3 style='color: #667eea; margin: 0;'>{means['orientation_angle']:.1f}°</h3>
                     <p style='color: rgba(255,255,255,0.8); margin: 0;'>Avg Orientation</p>
                 </div>
                 """, unsafe_allow_html=True)
@@ -248,7 +454,7 @@ def dual_image_analysis():
                 """, unsafe_allow_html=True)
             
             st.plotly_chart(
-                visualizer.create_heatmap(metrics['dop'], '🎯 Degree of Polarization (DOP)'),
+                visualizer.create_heatmap(downsample(metrics['dop'], PLOT_MAX_SIDE), '🎯 Degree of Polarization (DOP)'),
                 use_container_width=True
             )
 
@@ -267,6 +473,9 @@ def demo_mode():
     
     with col1:
         if st.button("🎮 Generate Sample Analysis", use_container_width=True):
+            from utils.polarization import PolarizationProcessor, StokesImage
+            from utils.visualization import PolarizationVisualizer
+            
             with st.spinner("✨ Creating magical polarization data..."):
                 # Create sample data
                 height, width = 300, 300
@@ -276,7 +485,7 @@ def demo_mode():
                 S1 = np.sin(3 * np.pi * x) * np.cos(3 * np.pi * y)
                 S2 = np.cos(3 * np.pi * x) * np.sin(3 * np.pi * y)
                 
-                stokes = np.stack([S0, S1, S2], axis=-1)
+                stokes = StokesImage(S0, S1, S2)
                 metrics = PolarizationProcessor.compute_polarization_metrics(stokes)
                 
                 visualizer = PolarizationVisualizer()
@@ -292,6 +501,70 @@ def demo_mode():
             else:
                 st.warning("📝 Please run create_verification_samples.py first")
 
+def history_page():
+    import pandas as pd
+    from datetime import datetime, timedelta, timezone
+    from utils.visualization import PolarizationVisualizer
+    
+    st.markdown("""
+    <div class='glass-card'>
+        <h2 style='color: white; margin-bottom: 1rem;'>🗂️ Run History</h2>
+        <p style='color: rgba(255,255,255,0.8);'>
+            Every Single and Dual analysis is recorded with its summary statistics. Filter by batch and
+            date to trend a metric over time; aggregates are computed by the database, not in memory.
+        </p>
+    </div>
+    """, unsafe_allow_html=True)
+    
+    history = get_run_history()
+    metrics = history.metrics()
+    if not metrics:
+        st.info("📭 No runs recorded yet — analyses from the Single and Dual pages will appear here.")
+        return
+    
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        batch = st.selectbox("Batch", [None] + history.batches(), key="history_batch",
+                             format_func=lambda b: "All batches" if b is None else (b or "(unlabelled)"))
+    with col2:
+        metric = st.selectbox("Metric", metrics, key="history_metric",
+                              index=metrics.index('dop') if 'dop' in metrics else 0)
+    with col3:
+        today = datetime.now(timezone.utc).date()
+        date_range = st.date_input("Dates (UTC)", (today - timedelta(days=30), today), key="history_dates")
+    if len(date_range) != 2:
+        st.info("📅 Pick an end date")
+        return
+    since = datetime.combine(date_range[0], datetime.min.time(), tzinfo=timezone.utc)
+    until = datetime.combine(date_range[1] + timedelta(days=1), datetime.min.time(), tzinfo=timezone.utc)
+    
+    totals = history.aggregate(metric, batch, since, until)
+    if not totals['runs']:
+        st.info("🔍 No runs match these filters")
+        return
+    
+    col1, col2, col3 = st.columns(3)
+    for col, label, value, color in (
+        (col1, "Runs", f"{totals['runs']:,}", '#00ff88'),
+        (col2, f"Mean {metric}", f"{totals['mean']:.4g}" if totals['mean'] is not None else "—", '#667eea'),
+        (col3, "Range", f"{totals['min']:.3g} – {totals['max']:.3g}" if totals['min'] is not None else "—", '#764ba2'),
+    ):
+        with col:
+            st.markdown(f"""
+            <div class='metric-card'>
+                <h3 style='color: {color}; margin: 0;'>{value}</h3>
+                <p style='color: rgba(255,255,255,0.8); margin: 0;'>{label}</p>
+            </div>
+            """, unsafe_allow_html=True)
+    
+    daily = history.daily_summary(metric, batch, since, until)
+    st.plotly_chart(PolarizationVisualizer.create_history_trend(daily, metric), use_container_width=True)
+    st.dataframe(pd.DataFrame(daily), use_container_width=True, hide_index=True)
+    
+    st.markdown(f"**Most recent {RECENT_RUNS} runs**")
+    st.dataframe(pd.DataFrame(history.recent_runs(metric, batch, since, until, limit=RECENT_RUNS)),
+                 use_container_width=True, hide_index=True)
+
 def learn_page():
     st.markdown("""
     <div class='glass-card'>
@@ -342,15 +615,53 @@ def learn_page():
         </div>
         """, unsafe_allow_html=True)
 
-def display_enhanced_results(images, metrics, file_names, visualizer, exporter):
+# Rows shown in the History page run table; older runs stay in the database
+RECENT_RUNS = 100
+
+STAT_COLUMNS = ['Mean', 'Std', 'Min', 'Max', 'Median']
+
+
+def blues_gradient(column):
+    """Per-column white-to-blue background, like Styler.background_gradient(cmap='Blues') without matplotlib"""
+    values = column.to_numpy(dtype=float)
+    span = np.nanmax(values) - np.nanmin(values)
+    scaled = (values - np.nanmin(values)) / span if span > 0 else np.zeros_like(values)
+    styles = []
+    for t in np.nan_to_num(scaled):
+        red, green, blue = (int(round(a + (b - a) * t)) for a, b in zip((247, 251, 255), (8, 48, 107)))
+        text = 'white' if t > 0.5 else 'black'
+        styles.append(f'background-color: rgb({red}, {green}, {blue}); color: {text}')
+    return styles
+
+
+def display_enhanced_results(images, metrics, file_names, visualizer, exporter, preview_factor=None, mask=None):
     # Success message with animation
-    st.markdown("""
-    <div style='background: linear-gradient(135deg, rgba(0,255,136,0.2), rgba(102,126,234,0.2)); 
-                border: 1px solid rgba(0,255,136,0.3); border-radius: 15px; padding: 2rem; text-align: center;'>
-        <h2 style='color: #00ff88; margin: 0;'>✅ Analysis Complete!</h2>
-        <p style='color: rgba(255,255,255,0.8); margin: 0.5rem 0 0 0;'>Polarization metrics successfully calculated</p>
-    </div>
-    """, unsafe_allow_html=True)
+    if preview_factor is None:
+        st.markdown("""
+        <div style='background: linear-gradient(135deg, rgba(0,255,136,0.2), rgba(102,126,234,0.2)); 
+                    border: 1px solid rgba(0,255,136,0.3); border-radius: 15px; padding: 2rem; text-align: center;'>
+            <h2 style='color: #00ff88; margin: 0;'>✅ Analysis Complete!</h2>
+            <p style='color: rgba(255,255,255,0.8); margin: 0.5rem 0 0 0;'>Polarization metrics successfully calculated</p>
+        </div>
+        """, unsafe_allow_html=True)
+    else:
+        st.markdown(f"""
+        <div style='background: linear-gradient(135deg, rgba(255,209,102,0.2), rgba(102,126,234,0.2)); 
+                    border: 1px solid rgba(255,209,102,0.3); border-radius: 15px; padding: 2rem; text-align: center;'>
+            <h2 style='color: #ffd166; margin: 0;'>⚡ Preview</h2>
+            <p style='color: rgba(255,255,255,0.8); margin: 0.5rem 0 0 0;'>
+                Computed at 1/{preview_factor:.0f} resolution — full-resolution results will replace it shortly
+            </p>
+        </div>
+        """, unsafe_allow_html=True)
+    
+    if mask is not None and not mask.all():
+        st.caption(f"🎭 {mask.mean():.1%} of pixels analysed — masked pixels are excluded from the "
+                   f"statistics and left blank in the plots")
+    
+    # One streaming pass gives both the cards and the summary table; orientation uses a circular mean
+    stats_df = exporter.create_summary_statistics(metrics, mask)
+    means = stats_df.set_index('Metric')['Mean']
     
     # Enhanced metrics display
     st.markdown("<br>", unsafe_allow_html=True)
@@ -359,10 +670,10 @@ def display_enhanced_results(images, metrics, file_names, visualizer, exporter):
     with col1:
         st.markdown(f"""
         <div class='metric-card pulse-glow'>
-            <h2 style='color: #00ff88; margin: 0; font-size: 2rem;'>{np.mean(metrics['dop']):.3f}</h2>
+            <h2 style='color: #00ff88; margin: 0; font-size: 2rem;'>{means['dop']:.3f}</h2>
             <p style='color: rgba(255,255,255,0.8); margin: 0;'>Degree of Polarization</p>
             <div style='height: 4px; background: rgba(255,255,255,0.2); border-radius: 2px; margin-top: 0.5rem;'>
-                <div style='height: 100%; background: #00ff88; border-radius: 2px; width: {np.mean(metrics['dop'])*100}%;'></div>
+                <div style='height: 100%; background: #00ff88; border-radius: 2px; width: {means['dop']*100}%;'></div>
             </div>
         </div>
         """, unsafe_allow_html=True)
@@ -370,7 +681,7 @@ def display_enhanced_results(images, metrics, file_names, visualizer, exporter):
     with col2:
         st.markdown(f"""
         <div class='metric-card'>
-            <h2 style='color: #667eea; margin: 0; font-size: 2rem;'>{np.mean(metrics['orientation_angle']):.1f}°</h2>
+            <h2 style='color: #667eea; margin: 0; font-size: 2rem;'>{means['orientation_angle']:.1f}°</h2>
             <p style='color: rgba(255,255,255,0.8); margin: 0;'>Orientation Angle</p>
         </div>
         """, unsafe_allow_html=True)
@@ -378,7 +689,7 @@ def display_enhanced_results(images, metrics, file_names, visualizer, exporter):
     with col3:
         st.markdown(f"""
         <div class='metric-card'>
-            <h2 style='color: #764ba2; margin: 0; font-size: 2rem;'>{np.mean(metrics['ellipticity_angle']):.1f}°</h2>
+            <h2 style='color: #764ba2; margin: 0; font-size: 2rem;'>{means['ellipticity_angle']:.1f}°</h2>
             <p style='color: rgba(255,255,255,0.8); margin: 0;'>Ellipticity Angle</p>
         </div>
         """, unsafe_allow_html=True)
@@ -401,8 +712,21 @@ def display_enhanced_results(images, metrics, file_names, visualizer, exporter):
     </div>
     """, unsafe_allow_html=True)
     
+    from utils.memory_planner import PLOT_MAX_SIDE
+    from utils.progressive import downsample
+    
+    # Heatmaps are serialised to the browser, so large frames are block-averaged first
+    plot_metrics = {key: None if value is None else downsample(value, PLOT_MAX_SIDE)
+                    for key, value in metrics.items()}
+    if mask is not None and not mask.all():
+        # The Stokes planes are computed everywhere; blank blocks with no valid pixel,
+        # as the NaN-filled metrics are after block averaging
+        analysed = downsample(mask, PLOT_MAX_SIDE) > 0
+        for key in ('S0', 'S1', 'S2'):
+            if plot_metrics.get(key) is not None:
+                plot_metrics[key] = np.where(analysed, plot_metrics[key], np.nan)
     st.plotly_chart(
-        visualizer.create_comprehensive_plots(metrics),
+        visualizer.create_comprehensive_plots(plot_metrics),
         use_container_width=True
     )
     
@@ -413,8 +737,11 @@ def display_enhanced_results(images, metrics, file_names, visualizer, exporter):
     </div>
     """, unsafe_allow_html=True)
     
-    stats_df = exporter.create_summary_statistics(metrics)
-    st.dataframe(stats_df.style.background_gradient(cmap='Blues'), use_container_width=True)
+    st.dataframe(stats_df.style.apply(blues_gradient, subset=STAT_COLUMNS), use_container_width=True)
+    
+    # Exports are only offered for full-resolution results
+    if preview_factor is not None:
+        return stats_df
     
     # Export options
     st.markdown("""
@@ -442,6 +769,8 @@ def display_enhanced_results(images, metrics, file_names, visualizer, exporter):
             mime="text/csv",
             use_container_width=True
         )
+    
+    return stats_df
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,121 @@
+import argparse
+import http.client
+import io
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+import numpy as np
+
+from utils.service import AnalysisServer
+
+ENDPOINTS = ("metrics", "stats")
+LAYOUTS = ("stack", "dofp")
+
+
+def make_payload(size: int, layout: str) -> bytes:
+    """A synthetic .npy body: a (4, size, size) uint8 stack or a (2*size, 2*size) DoFP mosaic"""
+    rng = np.random.default_rng(0)
+    if layout == "dofp":
+        data = rng.integers(0, 256, (2 * size, 2 * size), dtype=np.uint8)
+    else:
+        data = rng.integers(0, 256, (4, size, size), dtype=np.uint8)
+    buffer = io.BytesIO()
+    np.save(buffer, data)
+    return buffer.getvalue()
+
+
+def run_client(host: str, port: int, path: str, payload: bytes, requests: int) -> tuple:
+    """Send requests over one keep-alive connection; returns (latencies, bytes received, errors)"""
+    connection = http.client.HTTPConnection(host, port, timeout=300)
+    latencies, received, errors = [], 0, []
+    try:
+        for _ in range(requests):
+            start = time.perf_counter()
+            connection.request("POST", path, body=payload, headers={"Content-Type": "application/x-npy"})
+            response = connection.getresponse()
+            body = response.read()
+            latencies.append(time.perf_counter() - start)
+            received += len(body)
+            if response.status != 200:
+                errors.append(f"{response.status}: {body[:200].decode(errors='replace')}")
+    finally:
+        connection.close()
+    return latencies, received, errors
+
+
+def run_level(host: str, port: int, path: str, payload: bytes, clients: int, requests: int) -> dict:
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=clients) as pool:
+        results = list(pool.map(lambda _: run_client(host, port, path, payload, requests), range(clients)))
+    elapsed = time.perf_counter() - start
+
+    latencies = np.array([t for result in results for t in result[0]]) * 1000
+    errors = [e for result in results for e in result[2]]
+    return {
+        "clients": clients,
+        "requests": int(latencies.size),
+        "errors": len(errors),
+        "first_error": errors[0] if errors else None,
+        "p50_ms": float(np.percentile(latencies, 50)),
+        "p90_ms": float(np.percentile(latencies, 90)),
+        "p99_ms": float(np.percentile(latencies, 99)),
+        "requests_per_s": latencies.size / elapsed,
+        "upload_mb_per_s": latencies.size * len(payload) / elapsed / 2**20,
+        "download_mb_per_s": sum(result[1] for result in results) / elapsed / 2**20,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure analysis service throughput with keep-alive clients")
+    parser.add_argument("--url", default=None,
+                        help="Running service to benchmark; by default one is started in this process")
+    parser.add_argument("--workers", type=int, default=4, help="Workers for the in-process service")
+    parser.add_argument("--clients", default="1,2,4,8", help="Comma-separated client counts to run in turn")
+    parser.add_argument("--requests", type=int, default=10, help="Requests per client")
+    parser.add_argument("--size", type=int, default=512, help="Side of each polarization frame in pixels")
+    parser.add_argument("--layout", choices=LAYOUTS, default="stack")
+    parser.add_argument("--endpoint", choices=ENDPOINTS, default="metrics")
+    parser.add_argument("--query", default="compress=0", help="Extra query string, e.g. format=npy&metric=dop")
+    parser.add_argument("--output", default=None, help="Write the results as JSON here")
+    args = parser.parse_args()
+
+    server = None
+    if args.url is None:
+        server = AnalysisServer(("127.0.0.1", 0), workers=args.workers, quiet=True)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        host, port = "127.0.0.1", server.server_port
+    else:
+        url = urlsplit(args.url)
+        host, port = url.hostname, url.port or 80
+
+    payload = make_payload(args.size, args.layout)
+    path = f"/{args.endpoint}?layout={args.layout}" + (f"&{args.query}" if args.query else "")
+    report = {"path": path, "payload_bytes": len(payload), "levels": []}
+
+    print(f"POST {path} with {len(payload) / 2**20:.1f} MB bodies")
+    print(f"{'clients':>7} {'requests':>8} {'p50':>8} {'p90':>8} {'p99':>8} {'req/s':>7} {'MB/s in':>8} {'errors':>6}")
+    try:
+        for clients in (int(n) for n in args.clients.split(",")):
+            level = run_level(host, port, path, payload, clients, args.requests)
+            report["levels"].append(level)
+            print(f"{clients:>7} {level['requests']:>8} {level['p50_ms']:>6.0f}ms {level['p90_ms']:>6.0f}ms "
+                  f"{level['p99_ms']:>6.0f}ms {level['requests_per_s']:>7.1f} {level['upload_mb_per_s']:>8.1f} "
+                  f"{level['errors']:>6}")
+            if level["first_error"]:
+                print(f"        ❌ {level['first_error']}")
+    finally:
+        if server is not None:
+            server.shutdown()
+            server.server_close()
+
+    if args.output:
+        with open(args.output, "w") as fh:
+            json.dump(report, fh, indent=2)
+        print(f"📄 Report written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+import argparse
+import os
+import sys
+import tempfile
+import tracemalloc
+
+import numpy as np
+
+from utils.memory_planner import BIN_FACTORS, MB, ExecutionPlan, PLOT_MAX_SIDE, choose_tile_rows, estimate_peak
+from utils.progressive import analyse, downsample
+from utils.visualization import PolarizationVisualizer
+
+# An estimate may overshoot the measured peak by this much before it counts as wasteful
+MAX_OVERESTIMATE = 1.5
+SLACK_BYTES = 8 * MB
+
+SHAPES = [(1024, 1024), (1536, 2048)]
+# Integer camera frames as the app spools them: memory-mapped .npy files
+MAPPED_DTYPES = (np.uint8, np.uint16)
+# Large enough that a full-resolution float32 copy would dwarf the binned working set
+BINNED_SHAPE = (4096, 4096)
+
+
+def candidate_plans(width: int) -> list:
+    return [
+        ExecutionPlan("in_memory", 0),
+        ExecutionPlan("tiled", 0, tile_rows=choose_tile_rows(width)),
+        ExecutionPlan("reduced_precision", 0, tile_rows=choose_tile_rows(width), dtype=np.float16),
+        ExecutionPlan("binned", 0, tile_rows=choose_tile_rows(width // 2), bin_factor=2),
+    ]
+
+
+def binned_plans(width: int) -> list:
+    return [ExecutionPlan("binned", 0, tile_rows=choose_tile_rows(width // factor), bin_factor=factor)
+            for factor in BIN_FACTORS]
+
+
+def shifted_frames(frame: np.ndarray) -> list:
+    """Four copies of one frame offset by a pixel or two, so registration really resamples them"""
+    return [np.roll(frame, (offset, -offset), axis=(0, 1)) for offset in range(4)]
+
+
+def mapped_frames(directory: str, shape: tuple, dtype, rng: np.random.Generator) -> list:
+    """Four shifted random integer frames saved as .npy and reopened memory-mapped"""
+    frames = []
+    base = rng.integers(0, np.iinfo(dtype).max, shape, dtype=dtype)
+    for angle, frame in zip((0, 45, 90, 135), shifted_frames(base)):
+        path = os.path.join(directory, f"{np.dtype(dtype).name}_{shape[0]}x{shape[1]}_{angle}.npy")
+        np.save(path, frame)
+        frames.append(np.load(path, mmap_mode='r'))
+    del base
+    return frames
+
+
+def measure_peak(images: list, register: bool, plots: bool, plan: ExecutionPlan, mask_options: dict = None) -> int:
+    """Peak bytes traced while running the job the way the app does, optionally with the dashboard.
+
+    Raises FloatingPointError when a plan cannot store the results without overflowing.
+    """
+    tracemalloc.start()
+    try:
+        with np.errstate(over='raise'):
+            _images, metrics, _mask = analyse(images, register, plan, mask_options)
+        if not plots:
+            return tracemalloc.get_traced_memory()[1]
+        plot_metrics = {key: None if value is None else downsample(value, PLOT_MAX_SIDE)
+                        for key, value in metrics.items()}
+        PolarizationVisualizer.create_comprehensive_plots(plot_metrics).to_json()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def check(images: list, plans: list, mask_options: dict = None) -> int:
+    """Compare estimate and measurement for every plan; returns the number of failures"""
+    height, width = images[0].shape
+    label = f"{width}x{height} {images[0].dtype.name}" + (" masked" if mask_options else "")
+    failures = 0
+    for register in (False, True):
+        for plots in (False, True):
+            for plan in plans:
+                estimate = estimate_peak((height, width), input_itemsize=images[0].dtype.itemsize,
+                                         inputs_mapped=True, register=register, plots=plots,
+                                         tile_rows=plan.tile_rows, dtype=plan.dtype, bin_factor=plan.bin_factor,
+                                         masked=mask_options is not None)
+                mode = plan.mode if plan.bin_factor == 1 else f"{plan.mode} 1/{plan.bin_factor}"
+                try:
+                    measured = measure_peak(images, register, plots, plan, mask_options)
+                except FloatingPointError as exc:
+                    failures += 1
+                    print(f"{label:>24} {str(register):>8} {str(plots):>5} {mode:>17} ❌ {exc}")
+                    continue
+                ratio = estimate / measured
+                ok = measured <= estimate <= measured * MAX_OVERESTIMATE + SLACK_BYTES
+                failures += not ok
+                print(f"{label:>24} {str(register):>8} {str(plots):>5} {mode:>17} "
+                      f"{estimate / MB:>8.0f}MB {measured / MB:>8.0f}MB {ratio:>6.2f} {'✅' if ok else '❌'}")
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Validate memory planner estimates against measured peaks")
+    parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    failures = 0
+    print(f"{'input':>24} {'register':>8} {'plots':>5} {'mode':>17} {'estimate':>10} {'measured':>10} {'ratio':>6}")
+    for height, width in SHAPES:
+        # Inputs exist before measurement starts, so they are estimated as memory-mapped
+        images = shifted_frames(rng.random((height, width), dtype=np.float32) * 255)
+        failures += check(images, candidate_plans(width))
+
+    with tempfile.TemporaryDirectory() as directory:
+        for dtype in MAPPED_DTYPES:
+            # Saturation is tested on the input frames, so masked jobs hold input-resolution masks
+            saturated = {'min_intensity': 0.0, 'saturation_level': float(np.iinfo(dtype).max), 'user_mask': None}
+            for shape in SHAPES:
+                failures += check(mapped_frames(directory, shape, dtype, rng), candidate_plans(shape[1]))
+            failures += check(mapped_frames(directory, SHAPES[-1], dtype, rng), candidate_plans(SHAPES[-1][1]),
+                              saturated)
+            frames = mapped_frames(directory, BINNED_SHAPE, dtype, rng)
+            failures += check(frames, binned_plans(BINNED_SHAPE[1]))
+            failures += check(frames, binned_plans(BINNED_SHAPE[1]), saturated)
+
+    if failures:
+        print(f"❌ {failures} plan(s) overflowed or had estimates outside [measured, {MAX_OVERESTIMATE} x measured]")
+        sys.exit(1)
+    print("✅ All estimates cover the measured peaks")
+
+
+if __name__ == "__main__":
+    main()
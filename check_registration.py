@@ -0,0 +1,92 @@
+import argparse
+import sys
+
+import numpy as np
+from scipy import ndimage
+
+from utils.registration import register_frames, valid_region
+
+# Largest tolerated error of a recovered shift, in pixels
+MAX_ERROR_PX = 0.05
+
+SHAPES = [(480, 640), (1024, 1024)]
+SHIFTS = [(0.25, -0.4), (1.5, 2.75), (-3.3, 0.6)]
+
+
+def make_scene(shape: tuple, rng: np.random.Generator) -> np.ndarray:
+    """Smooth, non-periodic test scene with a brightness gradient, padded for cropping"""
+    height, width = shape[0] + 32, shape[1] + 32
+    scene = ndimage.gaussian_filter(rng.random((height, width)), 3) * 4000
+    scene += np.linspace(0, 60, width)[None, :] + np.linspace(0, 30, height)[:, None]
+    return scene
+
+
+def crop(scene: np.ndarray, shape: tuple, shift: tuple) -> np.ndarray:
+    """Centre crop of the scene moved by shift (dy, dx) with spline interpolation"""
+    moved = ndimage.shift(scene, shift, order=3, mode='nearest')
+    top, left = (scene.shape[0] - shape[0]) // 2, (scene.shape[1] - shape[1]) // 2
+    return moved[top:top + shape[0], left:left + shape[1]].astype(np.float32)
+
+
+def check_mismatched(scene: np.ndarray, shape: tuple, rng: np.random.Generator) -> int:
+    """Frames with no trustworthy match must come back unshifted and unmasked"""
+    reference = crop(scene, shape, (0, 0))
+    cases = {
+        'anti-correlated': 5000 - crop(scene, shape, (1.5, 2.75)),
+        'other scene': crop(make_scene(shape, rng), shape, (0, 0)),
+        'noise': rng.random(shape, dtype=np.float32) * 4000,
+    }
+    registered, shifts, rejected = register_frames([reference] + list(cases.values()))
+    failures = 0
+    for index, name in enumerate(cases, start=1):
+        ok = index in rejected and registered[index] is not None and np.array_equal(registered[index], cases[name])
+        failures += not ok
+        print(f"{shape[1]:>4}x{shape[0]:<4} {name:>16}: {rejected.get(index, 'accepted')} {'✅' if ok else '❌'}")
+    if valid_region(shape, shifts) is not None:
+        failures += 1
+        print(f"{'':>9} ❌ rejected frames still masked a border")
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check sub-pixel registration accuracy on non-periodic frames")
+    parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    failures = 0
+    print(f"{'shape':>9} {'true shift':>16} {'recovered':>16} {'error':>7} {'masked':>7}")
+    for shape in SHAPES:
+        scene = make_scene(shape, rng)
+        frames = [crop(scene, shape, (0, 0))] + [crop(scene, shape, shift) for shift in SHIFTS]
+        registered, shifts, rejected = register_frames(frames)
+        mask = valid_region(shape, shifts)
+        if rejected:
+            failures += 1
+            print(f"❌ matching frames were rejected: {rejected}")
+        for true_shift, found in zip(SHIFTS, shifts[1:]):
+            # The applied shift moves the frame back, so it is the negated displacement
+            error = float(np.abs(found + np.asarray(true_shift)).max())
+            ok = error <= MAX_ERROR_PX
+            failures += not ok
+            print(f"{shape[1]:>4}x{shape[0]:<4} ({true_shift[0]:>6.2f}, {true_shift[1]:>6.2f}) "
+                  f"({-found[0]:>6.2f}, {-found[1]:>6.2f}) {error:>7.3f} {1 - mask.mean():>6.1%} "
+                  f"{'✅' if ok else '❌'}")
+
+        # Inside the valid region the registered frames must agree with the reference
+        residual = max(float(np.abs(frame - registered[0])[mask].mean()) for frame in registered[1:])
+        contrast = float(np.abs(frames[0] - frames[0].mean()).mean())
+        ok = residual < 0.1 * contrast
+        failures += not ok
+        print(f"{'':>9} residual inside the valid region: {residual / contrast:.1%} of the scene contrast "
+              f"{'✅' if ok else '❌'}")
+
+        failures += check_mismatched(scene, shape, rng)
+
+    if failures:
+        print(f"❌ {failures} check(s) failed (shift tolerance {MAX_ERROR_PX} px)")
+        sys.exit(1)
+    print("✅ Registration recovers sub-pixel shifts of non-periodic frames and leaves mismatched frames alone")
+
+
+if __name__ == "__main__":
+    main()
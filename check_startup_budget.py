@@ -0,0 +1,90 @@
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+APP_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "app.py")
+
+# Latency budget for app.py, measured headlessly with Streamlit's AppTest
+COLD_START_BUDGET_S = 1.0   # first run of a fresh session in a fresh interpreter
+RERUN_BUDGET_S = 0.10       # median rerun of the landing page
+
+# Modules that only the pages doing analysis should pay for
+HEAVY_MODULES = ("pandas", "plotly", "scipy", "matplotlib", "PIL")
+
+PAGES = ["🎯 Single Image Analysis", "📚 Learn"]
+
+
+def measure(reruns: int) -> dict:
+    """Run app.py headlessly in this interpreter and report timings and imported modules"""
+    from streamlit.testing.v1 import AppTest
+
+    preloaded = set(sys.modules)
+    at = AppTest.from_file(APP_PATH, default_timeout=30)
+
+    start = time.perf_counter()
+    at.run()
+    cold_start = time.perf_counter() - start
+
+    rerun_times = []
+    for _ in range(reruns):
+        start = time.perf_counter()
+        at.run()
+        rerun_times.append(time.perf_counter() - start)
+
+    for page in PAGES:
+        at.radio(key="nav").set_value(page).run()
+
+    loaded = {name.split('.')[0] for name in set(sys.modules) - preloaded}
+    return {
+        "cold_start_s": cold_start,
+        "rerun_median_s": statistics.median(rerun_times),
+        "rerun_max_s": max(rerun_times),
+        "heavy_modules_loaded": sorted(loaded.intersection(HEAVY_MODULES)),
+        "exceptions": [exc.message for exc in at.exception],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check app.py cold-start and rerun latency against the budget")
+    parser.add_argument("--reruns", type=int, default=20, help="Reruns to time after the first run")
+    parser.add_argument("--measure", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.measure:
+        print(json.dumps(measure(args.reruns)))
+        return
+
+    # A fresh interpreter so earlier imports cannot hide cold-start cost
+    output = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), "--measure", "--reruns", str(args.reruns)],
+        capture_output=True, text=True, check=True
+    ).stdout
+    report = json.loads(output.strip().splitlines()[-1])
+
+    failures = []
+    if report["cold_start_s"] > COLD_START_BUDGET_S:
+        failures.append(f"cold start {report['cold_start_s']:.3f}s > {COLD_START_BUDGET_S}s")
+    if report["rerun_median_s"] > RERUN_BUDGET_S:
+        failures.append(f"median rerun {report['rerun_median_s'] * 1000:.1f}ms > {RERUN_BUDGET_S * 1000:.0f}ms")
+    if report["heavy_modules_loaded"]:
+        failures.append(f"heavy modules imported by {', '.join(PAGES)}: {', '.join(report['heavy_modules_loaded'])}")
+    if report["exceptions"]:
+        failures.append(f"app raised: {report['exceptions']}")
+
+    print(f"⏱️  Cold start:    {report['cold_start_s']:.3f}s (budget {COLD_START_BUDGET_S}s)")
+    print(f"🔁 Median rerun:  {report['rerun_median_s'] * 1000:.1f}ms (budget {RERUN_BUDGET_S * 1000:.0f}ms, "
+          f"max {report['rerun_max_s'] * 1000:.1f}ms)")
+    print(f"📦 Heavy modules: {', '.join(report['heavy_modules_loaded']) or 'none'}")
+
+    if failures:
+        print("❌ Over budget:\n  " + "\n  ".join(failures))
+        sys.exit(1)
+    print("✅ Within budget")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,199 @@
+import argparse
+import io
+import json
+import os
+import platform
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import streamlit
+from streamlit.testing.v1 import AppTest
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+APP_PATH = os.path.join(ROOT, "app.py")
+SAMPLES = os.path.join(ROOT, "verification_samples")
+
+SINGLE_PAGE = "🎯 Single Image Analysis"
+DUAL_PAGE = "🔄 Dual Image Analysis"
+DEMO_PAGE = "🚀 Demo Mode"
+FLOWS = ("single", "dual", "demo")
+
+UPLOADS_KEY = "_load_test_uploads"
+
+
+class SampleUpload(io.BytesIO):
+    """Stand-in for Streamlit's UploadedFile backed by a sample image"""
+
+    def __init__(self, path: str, file_id: str):
+        with open(path, "rb") as fh:
+            super().__init__(fh.read())
+        self.name = os.path.basename(path)
+        self.file_id = file_id
+        self.size = len(self.getvalue())
+        self.type = "image/png"
+
+
+_original_file_uploader = streamlit.file_uploader
+
+
+def _file_uploader_stand_in(label, *args, key=None, **kwargs):
+    """AppTest cannot upload files, so uploads are read from each session's own state"""
+    uploads = streamlit.session_state.get(UPLOADS_KEY, {})
+    if key in uploads:
+        return uploads[key]
+    return _original_file_uploader(label, *args, key=key, **kwargs)
+
+
+def sample(name: str) -> str:
+    return os.path.join(SAMPLES, name)
+
+
+def rss_bytes() -> int:
+    """Current resident set size of this process (the stand-in server)"""
+    try:
+        with open("/proc/self/statm") as fh:
+            return int(fh.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        import resource
+        # ru_maxrss is a high-water mark (KB on Linux, bytes on macOS)
+        scale = 1 if sys.platform == "darwin" else 1024
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale
+
+
+class Session:
+    """One simulated analyst driving app.py through the selected flows"""
+
+    def __init__(self, session_id: int, timeout: float):
+        self.session_id = session_id
+        self.app = AppTest.from_file(APP_PATH, default_timeout=timeout)
+        self.latencies = []
+        self.errors = []
+
+    def _run(self, step):
+        start = time.perf_counter()
+        step()
+        self.latencies.append(time.perf_counter() - start)
+        if self.app.exception:
+            self.errors.append(self.app.exception[0].message)
+
+    def _uploads(self, iteration: int) -> dict:
+        # Fresh file ids per iteration so every pass is a new upload, not a cached one
+        tag = f"{self.session_id}-{iteration}"
+        return {
+            "single_upload": [SampleUpload(sample(f"polarization_{angle}deg.png"), f"{angle}-{tag}")
+                              for angle in (0, 45, 90, 135)],
+            "I0": SampleUpload(sample("checkerboard_0deg.png"), f"I0-{tag}"),
+            "I90": SampleUpload(sample("checkerboard_90deg.png"), f"I90-{tag}"),
+        }
+
+    def run(self, iterations: int, flows: tuple):
+        app = self.app
+        self._run(app.run)
+        for iteration in range(iterations):
+            app.session_state[UPLOADS_KEY] = self._uploads(iteration)
+            if "single" in flows:
+                self._run(app.radio(key="nav").set_value(SINGLE_PAGE).run)
+                self._run(app.run)  # rerun with results already computed
+            if "dual" in flows:
+                self._run(app.radio(key="nav").set_value(DUAL_PAGE).run)
+            if "demo" in flows:
+                self._run(app.radio(key="nav").set_value(DEMO_PAGE).run)
+                self._run(app.button[0].click().run)
+
+
+def run_level(sessions: int, iterations: int, flows: tuple, timeout: float) -> dict:
+    """Drive `sessions` concurrent sessions and summarise latency, throughput and memory"""
+    peak_rss = [rss_bytes()]
+    done = threading.Event()
+
+    def sample_memory():
+        while not done.wait(0.05):
+            peak_rss[0] = max(peak_rss[0], rss_bytes())
+
+    start_rss = rss_bytes()
+    monitor = threading.Thread(target=sample_memory, daemon=True)
+    monitor.start()
+
+    simulated = [Session(i, timeout) for i in range(sessions)]
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=sessions) as pool:
+        for future in [pool.submit(s.run, iterations, flows) for s in simulated]:
+            future.result()
+    elapsed = time.perf_counter() - start
+    done.set()
+    monitor.join()
+
+    latencies = np.array([t for s in simulated for t in s.latencies]) * 1000
+    errors = [e for s in simulated for e in s.errors]
+    return {
+        "sessions": sessions,
+        "reruns": int(latencies.size),
+        "errors": len(errors),
+        "first_error": errors[0] if errors else None,
+        "p50_ms": float(np.percentile(latencies, 50)),
+        "p90_ms": float(np.percentile(latencies, 90)),
+        "p99_ms": float(np.percentile(latencies, 99)),
+        "max_ms": float(latencies.max()),
+        "throughput_reruns_per_s": latencies.size / elapsed,
+        "wall_time_s": elapsed,
+        "rss_start_mb": start_rss / 2**20,
+        "rss_peak_mb": peak_rss[0] / 2**20,
+    }
+
+
+def describe_build() -> dict:
+    try:
+        revision = subprocess.run(["git", "describe", "--always", "--dirty"], cwd=ROOT,
+                                  capture_output=True, text=True).stdout.strip()
+    except OSError:
+        revision = ""
+    return {
+        "revision": revision or "unknown",
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "python": platform.python_version(),
+        "streamlit": streamlit.__version__,
+        "cpus": os.cpu_count(),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Simulate concurrent analysts against app.py")
+    parser.add_argument("--sessions", default="1,2,4,8",
+                        help="Comma-separated concurrency levels to run in turn")
+    parser.add_argument("--iterations", type=int, default=3, help="Passes through the flows per session")
+    parser.add_argument("--flows", default=",".join(FLOWS), help=f"Subset of {', '.join(FLOWS)}")
+    parser.add_argument("--timeout", type=float, default=120.0, help="Seconds allowed per rerun")
+    parser.add_argument("--output", default="load_test_report.json", help="JSON report to write")
+    args = parser.parse_args()
+
+    flows = tuple(flow.strip() for flow in args.flows.split(",") if flow.strip())
+    unknown = set(flows) - set(FLOWS)
+    if unknown:
+        parser.error(f"unknown flows: {', '.join(sorted(unknown))}")
+    if not os.path.exists(sample("polarization_0deg.png")):
+        parser.error("verification_samples/ is missing; run create_verification_samples.py first")
+
+    streamlit.file_uploader = _file_uploader_stand_in
+    report = {"build": describe_build(), "flows": list(flows), "iterations": args.iterations, "levels": []}
+
+    print(f"{'sessions':>8} {'reruns':>6} {'p50':>8} {'p90':>8} {'p99':>8} {'rerun/s':>8} {'peak RSS':>9} {'errors':>6}")
+    for sessions in (int(n) for n in args.sessions.split(",")):
+        level = run_level(sessions, args.iterations, flows, args.timeout)
+        report["levels"].append(level)
+        print(f"{sessions:>8} {level['reruns']:>6} {level['p50_ms']:>6.0f}ms {level['p90_ms']:>6.0f}ms "
+              f"{level['p99_ms']:>6.0f}ms {level['throughput_reruns_per_s']:>8.1f} "
+              f"{level['rss_peak_mb']:>7.0f}MB {level['errors']:>6}")
+        if level["first_error"]:
+            print(f"         ❌ {level['first_error']}")
+
+    with open(args.output, "w") as fh:
+        json.dump(report, fh, indent=2)
+    print(f"📄 Report written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
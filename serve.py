@@ -0,0 +1,35 @@
+import argparse
+import signal
+import threading
+
+from utils.memory_planner import MB
+from utils.service import MAX_BODY_BYTES, AnalysisServer
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Serve polarization metrics over HTTP: POST a (4|2, H, W) .npy stack, an image or a DoFP frame"
+    )
+    parser.add_argument("--host", default="127.0.0.1", help="Interface to bind (loopback by default)")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--workers", type=int, default=4, help="Analyses run in parallel")
+    parser.add_argument("--max-body-mb", type=float, default=MAX_BODY_BYTES / MB,
+                        help="Largest request body accepted")
+    parser.add_argument("--quiet", action="store_true", help="Do not log each request")
+    args = parser.parse_args()
+
+    server = AnalysisServer((args.host, args.port), workers=args.workers,
+                            max_body_bytes=int(args.max_body_mb * MB), quiet=args.quiet)
+    # shutdown() blocks until serve_forever returns, so it must run off the serving thread
+    signal.signal(signal.SIGTERM, lambda *_: threading.Thread(target=server.shutdown).start())
+    print(f"🔬 Serving on http://{args.host}:{server.server_port} with {args.workers} workers")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+import json
+from functools import lru_cache
+
+import streamlit as st
+import streamlit.components.v1 as components
+
+from utils.canvas_flame import FLAME_MARKUP, FLAME_MAX_FPS, get_flame_script
+from utils.shaders import FONT_STYLESHEET, SHADER_CSS
+
+ASSETS_ID = "polarvision-assets"
+
+
+@lru_cache(maxsize=8)
+def build_asset_injector(flame_max_fps: float = FLAME_MAX_FPS) -> str:
+    """Script that adds the fonts, shader CSS and flame overlay to the app page once.
+
+    The component iframe is same-origin, so the assets are attached to the parent
+    document where they outlive the iframe and every later rerun. The flame script
+    is added as a script element there, so it runs in the page rather than the iframe.
+    """
+    return f"""
+    <script>
+    (function(){{
+      const doc = window.parent.document;
+      if (doc.getElementById({json.dumps(ASSETS_ID)})) return;
+
+      const marker = doc.createElement('meta');
+      marker.id = {json.dumps(ASSETS_ID)};
+      doc.head.appendChild(marker);
+
+      for (const origin of ['https://fonts.googleapis.com', 'https://fonts.gstatic.com']) {{
+        const hint = doc.createElement('link');
+        hint.rel = 'preconnect';
+        hint.href = origin;
+        hint.crossOrigin = '';
+        doc.head.appendChild(hint);
+      }}
+      const font = doc.createElement('link');
+      font.rel = 'stylesheet';
+      font.href = {json.dumps(FONT_STYLESHEET)};
+      doc.head.appendChild(font);
+
+      const style = doc.createElement('style');
+      style.textContent = {json.dumps(SHADER_CSS)};
+      doc.head.appendChild(style);
+
+      const overlay = doc.createElement('div');
+      overlay.innerHTML = '<div class="shader-background"></div>' + {json.dumps(FLAME_MARKUP)};
+      doc.body.append(...overlay.childNodes);
+
+      const flame = doc.createElement('script');
+      flame.textContent = {json.dumps(get_flame_script(flame_max_fps))};
+      doc.body.appendChild(flame);
+    }})();
+    </script>
+    """
+
+
+def inject_static_assets(flame_max_fps: float = FLAME_MAX_FPS):
+    """Inject page-wide styling on the first run of a session only.
+
+    Later runs only touch the page when the flame frame-rate cap (0 = off) changes.
+    """
+    if not st.session_state.get("assets_injected"):
+        components.html(build_asset_injector(flame_max_fps), height=0)
+        st.session_state.assets_injected = True
+    elif st.session_state.get("flame_applied_fps") != flame_max_fps:
+        components.html(f"""
+        <script>
+        const flame = window.parent.polarvisionFlame;
+        if (flame) flame.configure({{ maxFps: {json.dumps(flame_max_fps)} }});
+        </script>
+        """, height=0)
+    st.session_state.flame_applied_fps = flame_max_fps
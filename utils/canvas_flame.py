@@ -1,5 +1,15 @@
-def get_canvas_flame():
-    return """
+import json
+import os
+
+# Frame-rate cap for the overlay; 0 disables it (e.g. on shared lab workstations)
+FLAME_MAX_FPS = float(os.environ.get("POLARVISION_FLAME_MAX_FPS", 30))
+FLAME_FPS_CHOICES = tuple(sorted({0, 15, 30, 60, FLAME_MAX_FPS}))
+# Drawing time per frame above which the overlay steps down a quality level
+FRAME_BUDGET_MS = 4.0
+# The overlay fades out and stops once the pointer has been still this long (ms)
+IDLE_MS = 4000
+
+FLAME_MARKUP = """
     <canvas id="flame-canvas"></canvas>
     <style>
         /* full-viewport canvas that does not block interactions */
@@ -13,24 +23,50 @@ def get_canvas_flame():
             background: transparent;
         }
     </style>
-    <script>
-    (function(){
+"""
+
+FLAME_SCRIPT = """
+    (function(config){
       const canvas = document.getElementById('flame-canvas');
       const ctx = canvas.getContext('2d', { alpha: true });
 
+      // Quality levels from best to cheapest: drop the shadow blur, then halve the
+      // canvas resolution, then halve the number of blobs
+      const LEVELS = [
+        { blur: 40, scale: 1, blobs: 1 },
+        { blur: 0, scale: 1, blobs: 1 },
+        { blur: 0, scale: 0.5, blobs: 1 },
+        { blur: 0, scale: 0.5, blobs: 0.5 }
+      ];
+      const FADE_MS = 1500;
+      const SETTLE_FRAMES = 30;
+      let level = 0;
+      let workEma = 0, intervalEma = 0, settled = 0;
+      const overBudget = LEVELS.map(() => 0);
+
+      let minInterval = 0;
+      let enabled = false;
+      const reducedMotion = matchMedia('(prefers-reduced-motion: reduce)');
+
       function resize() {
-        const dpr = window.devicePixelRatio || 1;
-        canvas.width = window.innerWidth * dpr;
-        canvas.height = window.innerHeight * dpr;
-        canvas.style.width = window.innerWidth + 'px';
-        canvas.style.height = window.innerHeight + 'px';
+        const dpr = (window.devicePixelRatio || 1) * LEVELS[level].scale;
+        canvas.width = Math.round(innerWidth * dpr);
+        canvas.height = Math.round(innerHeight * dpr);
+        canvas.style.width = innerWidth + 'px';
+        canvas.style.height = innerHeight + 'px';
         ctx.setTransform(dpr, 0, 0, dpr, 0, 0);
       }
       addEventListener('resize', resize);
       resize();
 
       const mouse = { x: innerWidth / 2, y: innerHeight / 2 };
-      addEventListener('mousemove', (e) => { mouse.x = e.clientX; mouse.y = e.clientY; });
+      let lastMove = performance.now();
+      addEventListener('mousemove', (e) => {
+        mouse.x = e.clientX;
+        mouse.y = e.clientY;
+        lastMove = performance.now();
+        start();
+      });
 
       // blobs that form the lilac flame
       const N = 22;
@@ -48,17 +84,20 @@ def get_canvas_flame():
         });
       }
 
-      let last = performance.now();
-      function loop(t){
-        const dt = Math.min(40, t - last);
-        last = t;
-
-        // subtle background fade to keep gentle trails
-        ctx.fillStyle = 'rgba(8,6,12,0.18)';
-        ctx.fillRect(0,0,innerWidth,innerHeight);
+      function draw(t, dt, fading) {
+        // fade earlier frames towards transparent to keep gentle trails without
+        // darkening the page underneath
+        ctx.globalCompositeOperation = 'destination-out';
+        ctx.fillStyle = 'rgba(0,0,0,0.18)';
+        ctx.fillRect(0, 0, innerWidth, innerHeight);
+        ctx.globalCompositeOperation = 'source-over';
+        if (fading) return;
 
+        const quality = LEVELS[level];
+        const count = Math.ceil(blobs.length * quality.blobs);
         ctx.globalCompositeOperation = 'lighter';
-        for (let i = 0; i < blobs.length; i++){
+        ctx.shadowBlur = quality.blur;
+        for (let i = 0; i < count; i++){
           const b = blobs[i];
 
           const dx = mouse.x - b.x + Math.sin(t * 0.002 + i) * 10;
@@ -82,8 +121,7 @@ def get_canvas_flame():
           g.addColorStop(0.55, `hsla(${b.hue}, 60%, 20%, ${b.alpha * 0.12})`);
           g.addColorStop(1, 'rgba(0,0,0,0)');
 
-          ctx.shadowBlur = 40;
-          ctx.shadowColor = c1;
+          if (quality.blur) ctx.shadowColor = c1;
           ctx.fillStyle = g;
           ctx.beginPath();
           ctx.arc(b.x, b.y, s, 0, Math.PI * 2);
@@ -92,10 +130,100 @@ def get_canvas_flame():
 
         ctx.shadowBlur = 0;
         ctx.globalCompositeOperation = 'source-over';
-        requestAnimationFrame(loop);
       }
 
-      requestAnimationFrame(loop);
-    })();
-    </script>
+      // Step quality down while frames cost more than the budget (or the browser
+      // cannot keep up with the target rate) and back up once there is headroom
+      function adapt(work, interval) {
+        workEma = workEma ? workEma * 0.9 + work * 0.1 : work;
+        intervalEma = intervalEma ? intervalEma * 0.9 + interval * 0.1 : interval;
+        if (++settled < SETTLE_FRAMES) return;
+        const target = Math.max(minInterval, 1000 / 60);
+        if ((workEma > config.frameBudgetMs || intervalEma > target * 1.5) && level < LEVELS.length - 1) {
+          overBudget[level]++;
+          level++;
+        } else if (workEma < config.frameBudgetMs / 4 && level > 0 && overBudget[level - 1] < 2) {
+          level--;
+        } else {
+          return;
+        }
+        settled = 0;
+        workEma = intervalEma = 0;
+        resize();
+      }
+
+      let frame = null;
+      let last = 0, lastDraw = 0;
+      function loop(t){
+        frame = requestAnimationFrame(loop);
+        if (t - lastDraw < minInterval) return;
+        const interval = t - lastDraw;
+        lastDraw = t;
+
+        const idle = t - lastMove;
+        if (idle > config.idleMs + FADE_MS) {
+          // the trails have faded; sleep until the pointer moves again
+          stop();
+          return;
+        }
+
+        const dt = Math.min(40, t - last);
+        last = t;
+        const begin = performance.now();
+        draw(t, dt, idle > config.idleMs);
+        adapt(performance.now() - begin, interval);
+      }
+
+      function shouldRun() {
+        return enabled && !document.hidden && !reducedMotion.matches;
+      }
+
+      function start() {
+        if (frame !== null || !shouldRun()) return;
+        last = lastDraw = performance.now();
+        settled = 0;
+        workEma = intervalEma = 0;
+        frame = requestAnimationFrame(loop);
+      }
+
+      function stop() {
+        if (frame !== null) cancelAnimationFrame(frame);
+        frame = null;
+        ctx.clearRect(0, 0, innerWidth, innerHeight);
+      }
+
+      document.addEventListener('visibilitychange', () => document.hidden ? stop() : start());
+      reducedMotion.addEventListener('change', () => reducedMotion.matches ? stop() : start());
+
+      function configure(options) {
+        enabled = options.maxFps > 0;
+        minInterval = enabled ? 1000 / options.maxFps : 0;
+        canvas.style.display = enabled ? '' : 'none';
+        if (enabled) {
+          lastMove = performance.now();
+          start();
+        } else {
+          stop();
+        }
+      }
+      window.polarvisionFlame = { configure };
+      configure(config);
+    })(__FLAME_CONFIG__);
+"""
+
+
+def get_flame_script(max_fps: float = FLAME_MAX_FPS) -> str:
+    """The flame animation script with its frame-rate cap and adaptive-quality settings"""
+    config = {'maxFps': max_fps, 'frameBudgetMs': FRAME_BUDGET_MS, 'idleMs': IDLE_MS}
+    return FLAME_SCRIPT.replace("__FLAME_CONFIG__", json.dumps(config))
+
+
+def get_canvas_flame(enabled: bool = True, max_fps: float = FLAME_MAX_FPS) -> str:
+    """Full-viewport lilac flame overlay that follows the mouse.
+    
+    The animation caps itself at ``max_fps``, degrades when frames run over budget,
+    pauses on hidden tabs or an idle pointer and honours prefers-reduced-motion.
     """
+    if not enabled or max_fps <= 0:
+        return ""
+    return FLAME_MARKUP + "<script>\n" + get_flame_script(max_fps) + "</script>\n"
@@ -0,0 +1,212 @@
+import json
+import math
+import os
+import sqlite3
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from typing import Optional
+
+from utils.statistics import AXIAL_METRICS
+
+# One SQLite file per machine; point several app instances at the same file to share history
+HISTORY_PATH = os.environ.get(
+    "POLARVISION_HISTORY_DB",
+    os.path.join(os.path.expanduser("~"), ".polarvision", "history.sqlite3")
+)
+
+STAT_FIELDS = ('Mean', 'Std', 'Min', 'Max', 'Median')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY,
+    created_at TEXT NOT NULL,          -- UTC, 'YYYY-MM-DD HH:MM:SS'
+    mode TEXT NOT NULL,                -- single or dual
+    batch TEXT NOT NULL DEFAULT '',
+    files TEXT NOT NULL,               -- JSON list of input file names
+    width INTEGER NOT NULL,
+    height INTEGER NOT NULL,
+    valid_fraction REAL NOT NULL,
+    settings TEXT NOT NULL DEFAULT '{}'
+);
+CREATE INDEX IF NOT EXISTS runs_created_at ON runs (created_at);
+CREATE INDEX IF NOT EXISTS runs_batch_created_at ON runs (batch, created_at);
+
+CREATE TABLE IF NOT EXISTS metric_stats (
+    run_id INTEGER NOT NULL REFERENCES runs (id) ON DELETE CASCADE,
+    metric TEXT NOT NULL,
+    mean REAL,
+    std REAL,
+    min REAL,
+    max REAL,
+    median REAL,
+    axial_cos REAL,                    -- cos/sin of twice the mean, for axial metrics only
+    axial_sin REAL,
+    PRIMARY KEY (run_id, metric)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS metric_stats_metric ON metric_stats (metric, run_id);
+"""
+
+
+def _timestamp(value: Optional[datetime] = None) -> str:
+    value = value or datetime.now(timezone.utc)
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc)
+    return value.strftime('%Y-%m-%d %H:%M:%S')
+
+
+def _number(value) -> Optional[float]:
+    """SQLite stores NaN as NULL, which aggregates then skip"""
+    value = float(value)
+    return None if value != value else value
+
+
+def _axial_components(metric: str, mean: Optional[float]) -> tuple:
+    """Unit vector of an axial mean angle in the doubled-angle plane, so runs can be averaged on the circle"""
+    if metric not in AXIAL_METRICS or mean is None:
+        return None, None
+    doubled = math.radians(2 * mean)
+    return math.cos(doubled), math.sin(doubled)
+
+
+def _axial_mean(row: dict) -> dict:
+    """Replace the linear average of axial means with their circular mean.
+
+    A linear range of axial means has no meaning on the circle, so it is dropped.
+    """
+    cos_mean, sin_mean = row.pop('axial_cos'), row.pop('axial_sin')
+    if cos_mean is not None and sin_mean is not None:
+        row['mean'] = math.degrees(0.5 * math.atan2(sin_mean, cos_mean))
+        for key in ('lowest_mean', 'highest_mean'):
+            if key in row:
+                row[key] = None
+    return row
+
+
+class RunHistory:
+    """Append-only store of analysis runs and their per-metric summary statistics"""
+
+    def __init__(self, path: str = HISTORY_PATH):
+        self.path = path
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with self._connect() as db:
+            db.executescript(SCHEMA)
+
+    @contextmanager
+    def _connect(self):
+        # A short-lived connection per call, so sessions on different threads never share one
+        db = sqlite3.connect(self.path, timeout=10)
+        db.row_factory = sqlite3.Row
+        try:
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA foreign_keys=ON")
+            with db:
+                yield db
+        finally:
+            db.close()
+
+    def record_run(self, mode: str, stats_rows: list, shape: tuple, file_names: list = (),
+                   batch: str = '', valid_fraction: float = 1.0, settings: Optional[dict] = None,
+                   created_at: Optional[datetime] = None) -> int:
+        """Store one run with rows shaped like create_summary_statistics output; returns the run id"""
+        with self._connect() as db:
+            cursor = db.execute(
+                "INSERT INTO runs (created_at, mode, batch, files, width, height, valid_fraction, settings) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (_timestamp(created_at), mode, batch.strip(), json.dumps(list(file_names)),
+                 int(shape[1]), int(shape[0]), float(valid_fraction), json.dumps(settings or {}))
+            )
+            run_id = cursor.lastrowid
+            values = []
+            for row in stats_rows:
+                stats = [_number(row[field]) for field in STAT_FIELDS]
+                values.append((run_id, row['Metric'], *stats, *_axial_components(row['Metric'], stats[0])))
+            db.executemany(
+                "INSERT INTO metric_stats (run_id, metric, mean, std, min, max, median, axial_cos, axial_sin) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                values
+            )
+        return run_id
+
+    @staticmethod
+    def _filters(batch: Optional[str], since: Optional[datetime], until: Optional[datetime],
+                 mode: Optional[str]) -> tuple:
+        clauses, params = [], []
+        if batch is not None:
+            clauses.append("r.batch = ?")
+            params.append(batch)
+        if since is not None:
+            clauses.append("r.created_at >= ?")
+            params.append(_timestamp(since))
+        if until is not None:
+            clauses.append("r.created_at < ?")
+            params.append(_timestamp(until))
+        if mode is not None:
+            clauses.append("r.mode = ?")
+            params.append(mode)
+        return clauses, params
+
+    def batches(self) -> list:
+        """Distinct batch labels, read from the batch index"""
+        with self._connect() as db:
+            return [row[0] for row in db.execute("SELECT DISTINCT batch FROM runs ORDER BY batch")]
+
+    def metrics(self) -> list:
+        with self._connect() as db:
+            return [row[0] for row in db.execute("SELECT DISTINCT metric FROM metric_stats ORDER BY metric")]
+
+    def daily_summary(self, metric: str, batch: Optional[str] = None, since: Optional[datetime] = None,
+                      until: Optional[datetime] = None, mode: Optional[str] = None) -> list:
+        """Per-day aggregates of one metric over the matching runs, computed in SQL.
+
+        Axial metrics (orientation) report the circular mean of the runs' mean angles.
+        """
+        clauses, params = self._filters(batch, since, until, mode)
+        where = " AND ".join(["s.metric = ?"] + clauses)
+        query = f"""
+            SELECT date(r.created_at) AS day,
+                   COUNT(*) AS runs,
+                   AVG(s.mean) AS mean,
+                   AVG(s.axial_cos) AS axial_cos,
+                   AVG(s.axial_sin) AS axial_sin,
+                   MIN(s.mean) AS lowest_mean,
+                   MAX(s.mean) AS highest_mean,
+                   AVG(s.std) AS mean_std,
+                   MIN(s.min) AS min,
+                   MAX(s.max) AS max
+            FROM metric_stats AS s JOIN runs AS r ON r.id = s.run_id
+            WHERE {where}
+            GROUP BY day
+            ORDER BY day
+        """
+        with self._connect() as db:
+            return [_axial_mean(dict(row)) for row in db.execute(query, [metric] + params)]
+
+    def aggregate(self, metric: str, batch: Optional[str] = None, since: Optional[datetime] = None,
+                  until: Optional[datetime] = None, mode: Optional[str] = None) -> dict:
+        """One-row aggregate, e.g. mean DOP of a batch over the last month"""
+        clauses, params = self._filters(batch, since, until, mode)
+        where = " AND ".join(["s.metric = ?"] + clauses)
+        query = f"""
+            SELECT COUNT(*) AS runs, AVG(s.mean) AS mean, AVG(s.axial_cos) AS axial_cos,
+                   AVG(s.axial_sin) AS axial_sin, MIN(s.min) AS min, MAX(s.max) AS max
+            FROM metric_stats AS s JOIN runs AS r ON r.id = s.run_id
+            WHERE {where}
+        """
+        with self._connect() as db:
+            return _axial_mean(dict(db.execute(query, [metric] + params).fetchone()))
+
+    def recent_runs(self, metric: str = 'dop', batch: Optional[str] = None, since: Optional[datetime] = None,
+                    until: Optional[datetime] = None, mode: Optional[str] = None, limit: int = 100) -> list:
+        """Newest matching runs with one metric's statistics, at most ``limit`` rows"""
+        clauses, params = self._filters(batch, since, until, mode)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        query = f"""
+            SELECT r.id, r.created_at, r.mode, r.batch, r.files, r.width, r.height, r.valid_fraction,
+                   s.mean, s.std, s.median
+            FROM runs AS r LEFT JOIN metric_stats AS s ON s.run_id = r.id AND s.metric = ?
+            {where}
+            ORDER BY r.created_at DESC
+            LIMIT ?
+        """
+        with self._connect() as db:
+            return [dict(row) for row in db.execute(query, [metric] + params + [limit])]
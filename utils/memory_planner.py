@@ -0,0 +1,194 @@
+import math
+import os
+import threading
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Callable, Optional
+
+import numpy as np
+
+from utils.polarization import ComputationCancelled
+
+MB = 1024 * 1024
+
+# Budgets are configurable per deployment; a job may never exceed the global budget
+JOB_BUDGET_BYTES = int(float(os.environ.get("POLARVISION_JOB_MEMORY_MB", 2048)) * MB)
+GLOBAL_BUDGET_BYTES = int(float(os.environ.get("POLARVISION_GLOBAL_MEMORY_MB", 6144)) * MB)
+
+# Peak bytes per pixel of each stage, calibrated against tracemalloc peaks
+# (check_memory_estimates.py re-measures them)
+IN_MEMORY_BYTES = 44        # Stokes planes, validity mask, three derived planes and ufunc temporaries
+IN_MEMORY_RETAINED = 24     # what compute_polarization_metrics leaves behind
+TILE_WORKING_BYTES = 38     # per pixel of one row band in compute_metrics_tiled
+BOUNDED_PLANES = 3          # dop, orientation, ellipticity: stored in the plan's dtype
+STOKES_PLANES = 3           # S0, S1, S2: always float32, intensities overflow float16
+REGISTRATION_BYTES = 40     # FFT buffers while aligning three frames to the reference
+REGISTRATION_RETAINED = 12  # the three registered float32 frames
+INPUT_MASK_BYTES = 2        # saturation and user masks, combined per input pixel before binning
+BIN_BAND_BYTES = 8          # float32 band copy and block-mean temporaries, per pixel of one band
+PLOT_BYTES = 184            # float32 plot copies, six heatmaps and their JSON, per plotted pixel
+
+# Largest side sent to the dashboard heatmaps
+PLOT_MAX_SIDE = 1024
+# Working set targeted by a single row band when tiling
+TILE_TARGET_BYTES = 64 * MB
+MIN_TILE_ROWS = 16
+# Input pixels converted to float32 at a time while binning
+BIN_BAND_PIXELS = 1 << 20
+BIN_FACTORS = (2, 4, 8)
+
+
+@dataclass
+class ExecutionPlan:
+    """How a job will run and what it is expected to allocate at peak"""
+    mode: str                      # in_memory, tiled, reduced_precision, binned or rejected
+    peak_bytes: int
+    tile_rows: Optional[int] = None
+    dtype: type = np.float32
+    bin_factor: int = 1
+    message: str = ""
+
+    @property
+    def rejected(self) -> bool:
+        return self.mode == "rejected"
+
+
+def _mb(nbytes: float) -> str:
+    return f"{nbytes / MB:,.0f} MB"
+
+
+def choose_tile_rows(width: int) -> int:
+    """Rows per band so one band's working set stays near TILE_TARGET_BYTES"""
+    return max(MIN_TILE_ROWS, TILE_TARGET_BYTES // (TILE_WORKING_BYTES * max(1, width)))
+
+
+def plotted_pixels(height: int, width: int) -> int:
+    """Pixels left after the dashboard downsamples to PLOT_MAX_SIDE"""
+    factor = max(1, math.ceil(max(height, width) / PLOT_MAX_SIDE))
+    return (height // factor) * (width // factor)
+
+
+def estimate_peak(shape: tuple, n_inputs: int = 4, input_itemsize: int = 4, inputs_mapped: bool = False,
+                  register: bool = False, plots: bool = True, tile_rows: Optional[int] = None,
+                  dtype=np.float32, bin_factor: int = 1, masked: bool = False) -> int:
+    """Estimate peak bytes for one analysis job.
+
+    ``tile_rows=None`` means the whole frame is processed at once; memory-mapped
+    inputs live in the page cache and are not counted. ``masked`` jobs test
+    saturation or apply a user mask at input resolution.
+    """
+    height, width = shape[:2]
+    full_pixels = height * width
+    inputs = 0 if inputs_mapped else n_inputs * input_itemsize * full_pixels
+    binning_peak = 0
+    if bin_factor > 1:
+        height, width = height // bin_factor, width // bin_factor
+        inputs += n_inputs * 4 * height * width
+        # Frames are binned one row band at a time
+        binning_peak = BIN_BAND_BYTES * min(BIN_BAND_PIXELS, full_pixels)
+    pixels = height * width
+
+    registration_peak = registration_retained = 0
+    if register and n_inputs == 4:
+        registration_peak = REGISTRATION_BYTES * pixels
+        registration_retained = REGISTRATION_RETAINED * pixels
+
+    if tile_rows is None:
+        metrics_peak = IN_MEMORY_BYTES * pixels
+        metrics_retained = IN_MEMORY_RETAINED * pixels
+    else:
+        metrics_retained = (BOUNDED_PLANES * np.dtype(dtype).itemsize + STOKES_PLANES * 4) * pixels
+        metrics_peak = metrics_retained + TILE_WORKING_BYTES * min(tile_rows, height) * width
+
+    mask_peak = INPUT_MASK_BYTES * full_pixels if masked else 0
+    # The validity mask at working resolution is held until the job ends
+    mask_retained = pixels if masked else 0
+    plot_peak = PLOT_BYTES * plotted_pixels(height, width) if plots else 0
+    return int(inputs + max(
+        binning_peak,
+        registration_peak,
+        registration_retained + mask_peak,
+        registration_retained + mask_retained + metrics_peak,
+        registration_retained + mask_retained + metrics_retained + plot_peak
+    ))
+
+
+def plan_job(shape: tuple, n_inputs: int = 4, input_itemsize: int = 4, inputs_mapped: bool = False,
+             register: bool = False, plots: bool = True, masked: bool = False, job_budget: int = None,
+             global_budget: int = None) -> ExecutionPlan:
+    """Pick the highest-quality execution mode that fits the per-job and global budgets"""
+    job_budget = JOB_BUDGET_BYTES if job_budget is None else job_budget
+    global_budget = GLOBAL_BUDGET_BYTES if global_budget is None else global_budget
+    limit = min(job_budget, global_budget)
+    common = dict(n_inputs=n_inputs, input_itemsize=input_itemsize, inputs_mapped=inputs_mapped,
+                  register=register, plots=plots, masked=masked)
+
+    candidates = [
+        ExecutionPlan("in_memory", 0),
+        ExecutionPlan("tiled", 0, tile_rows=choose_tile_rows(shape[1])),
+        ExecutionPlan("reduced_precision", 0, tile_rows=choose_tile_rows(shape[1]), dtype=np.float16),
+    ] + [
+        ExecutionPlan("binned", 0, tile_rows=choose_tile_rows(shape[1] // factor), bin_factor=factor)
+        for factor in BIN_FACTORS
+        if shape[0] // factor and shape[1] // factor  # binning must leave at least one pixel
+    ]
+    for plan in candidates:
+        plan.peak_bytes = estimate_peak(shape, tile_rows=plan.tile_rows, dtype=plan.dtype,
+                                        bin_factor=plan.bin_factor, **common)
+        if plan.peak_bytes <= limit:
+            if plan.mode == "reduced_precision":
+                plan.message = "DOP and angles stored in float16 to fit the memory budget"
+            elif plan.mode == "binned":
+                plan.message = f"Computed at 1/{plan.bin_factor} resolution to fit the memory budget"
+            return plan
+
+    smallest = candidates[-1]
+    cheapest = (f"at 1/{smallest.bin_factor} resolution" if smallest.bin_factor > 1
+                else "in reduced precision")
+    return ExecutionPlan(
+        "rejected", smallest.peak_bytes,
+        message=(f"A {shape[1]}x{shape[0]} job needs at least {_mb(smallest.peak_bytes)} even "
+                 f"{cheapest}, over the {_mb(limit)} per-job limit. "
+                 f"Crop or downsample the images before uploading.")
+    )
+
+
+class MemoryBudget:
+    """Process-wide ledger of memory reserved by running jobs; jobs over the limit wait their turn"""
+
+    def __init__(self, total_bytes: int):
+        self.total_bytes = total_bytes
+        self.in_use = 0
+        self._condition = threading.Condition()
+
+    @contextmanager
+    def reserve(self, nbytes: int, should_stop: Optional[Callable[[], bool]] = None,
+                on_wait: Optional[Callable[[], None]] = None):
+        """Hold nbytes of the budget for the duration of the block, queueing until it is free"""
+        if nbytes > self.total_bytes:
+            raise MemoryError(f"Job needs {_mb(nbytes)}, more than the {_mb(self.total_bytes)} global budget")
+        with self._condition:
+            while self.in_use + nbytes > self.total_bytes:
+                if should_stop is not None and should_stop():
+                    raise ComputationCancelled()
+                if on_wait is not None:
+                    on_wait()
+                self._condition.wait(0.25)
+            self.in_use += nbytes
+        try:
+            yield
+        finally:
+            self.release(nbytes)
+
+    def hold(self, nbytes: int):
+        """Count nbytes that are already allocated (e.g. a kept result) until release() is called"""
+        with self._condition:
+            self.in_use += nbytes
+
+    def release(self, nbytes: int):
+        with self._condition:
+            self.in_use -= nbytes
+            self._condition.notify_all()
+
+
+GLOBAL_BUDGET = MemoryBudget(GLOBAL_BUDGET_BYTES)
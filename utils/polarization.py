@@ -1,55 +1,257 @@
 import numpy as np
-from PIL import Image
-from typing import Dict
+from typing import Callable, Dict, Optional
+
+# Planes with fixed, small ranges (DOP in [0, 1], angles in degrees) that a reduced
+# ``dtype`` may store; Stokes intensities of 16-bit frames overflow float16
+BOUNDED_METRICS = ('dop', 'orientation_angle', 'ellipticity_angle')
+
+# Below this fraction of valid pixels, metrics are computed on the compressed
+# valid pixels and scattered back; above it, computing every pixel and blanking
+# the invalid ones is faster than the gather/scatter round trip
+SPARSE_FRACTION = 0.3
+
+
+class ComputationCancelled(Exception):
+    """Raised when a tiled computation is stopped before it finishes"""
+
+
+class StokesImage:
+    """Stokes parameters held as separate contiguous planes.
+    
+    ``s2`` is None when it was not measured (dual-image mode) and is never
+    allocated. Indexing with ``stokes[..., i]`` and ``np.asarray(stokes)`` give
+    the old stacked (H, W, 3) layout for callers that still expect it.
+    """
+    __slots__ = ('s0', 's1', 's2')
+    
+    def __init__(self, s0: np.ndarray, s1: np.ndarray, s2: Optional[np.ndarray] = None):
+        self.s0 = s0
+        self.s1 = s1
+        self.s2 = s2
+    
+    @classmethod
+    def from_array(cls, stokes: np.ndarray) -> 'StokesImage':
+        """Split a stacked (H, W, 3) array into contiguous planes"""
+        return cls(*(np.ascontiguousarray(stokes[..., i]) for i in range(3)))
+    
+    @property
+    def shape(self) -> tuple:
+        """Shape of a single plane"""
+        return self.s0.shape
+    
+    @property
+    def dtype(self):
+        return self.s0.dtype
+    
+    def plane(self, index: int) -> np.ndarray:
+        """One Stokes plane; an absent S2 reads as a zero-stride view of zeros"""
+        value = (self.s0, self.s1, self.s2)[index]
+        if value is None:
+            return np.broadcast_to(np.zeros((), dtype=self.dtype), self.shape)
+        return value
+    
+    def __getitem__(self, key):
+        if isinstance(key, tuple) and len(key) == 2 and key[0] is Ellipsis and isinstance(key[1], int):
+            return self.plane(key[1])
+        return np.asarray(self)[key]
+    
+    def __array__(self, dtype=None, copy=None):
+        stacked = np.stack([self.plane(i) for i in range(3)], axis=-1)
+        return stacked if dtype is None else stacked.astype(dtype, copy=False)
+
 
 class PolarizationProcessor:
     @staticmethod
-    def compute_stokes_single(images: list) -> np.ndarray:
+    def compute_stokes_single(images: list) -> StokesImage:
         """Compute Stokes parameters from 4 polarization images"""
         if len(images) != 4:
             raise ValueError("Need exactly 4 images for Stokes computation")
             
         I0, I45, I90, I135 = images
         
-        # Compute Stokes parameters
-        S0 = (I0 + I45 + I90 + I135) / 2
-        S1 = I0 - I90
-        S2 = I45 - I135
+        # Compute Stokes parameters in float32 so integer or memory-mapped inputs
+        # are read directly without overflow or an intermediate float copy
+        S0 = np.add(I0, I45, dtype=np.float32)
+        S0 += I90
+        S0 += I135
+        S0 /= 2
+        S1 = np.subtract(I0, I90, dtype=np.float32)
+        S2 = np.subtract(I45, I135, dtype=np.float32)
+        
+        return StokesImage(S0, S1, S2)
+    
+    @staticmethod
+    def compute_stokes_dual(I0: np.ndarray, I90: np.ndarray) -> StokesImage:
+        """Compute Stokes parameters from 2 images (0° and 90°); S2 is not measured"""
+        S0 = np.add(I0, I90, dtype=np.float32)
+        S1 = np.subtract(I0, I90, dtype=np.float32)
         
-        return np.stack([S0, S1, S2], axis=-1)
+        return StokesImage(S0, S1)
+    
+    @staticmethod
+    def compute_unsaturated_mask(images: list, saturation_level: float, tile_rows: int = 512) -> np.ndarray:
+        """Boolean mask of pixels where no input frame reaches ``saturation_level``, in row bands"""
+        height = images[0].shape[0]
+        mask = np.empty(images[0].shape, dtype=bool)
+        for start in range(0, height, tile_rows):
+            band = mask[start:start + tile_rows]
+            np.less(images[0][start:start + tile_rows], saturation_level, out=band)
+            for img in images[1:]:
+                band &= img[start:start + tile_rows] < saturation_level
+        return mask
     
     @staticmethod
-    def compute_stokes_dual(I0: np.ndarray, I90: np.ndarray) -> np.ndarray:
-        """Compute Stokes parameters from 2 images (0° and 90°)"""
-        S0 = I0 + I90
-        S1 = I0 - I90
-        S2 = np.zeros_like(S0)
+    def compute_validity_mask(images: list, min_intensity: float = 0.0,
+                              saturation_level: Optional[float] = None,
+                              user_mask: Optional[np.ndarray] = None,
+                              tile_rows: int = 512) -> np.ndarray:
+        """Boolean mask of informative pixels.
         
-        return np.stack([S0, S1, S2], axis=-1)
+        A pixel is valid when its total intensity S0 is above ``min_intensity``,
+        no input frame reaches ``saturation_level`` and ``user_mask`` (if given)
+        is non-zero there. Works in row bands so it never holds a float plane.
+        """
+        height = images[0].shape[0]
+        mask = np.empty(images[0].shape, dtype=bool)
+        # S0 is the sum of the 0° and 90° (and 45°/135°) frames, halved for 4 frames
+        threshold = min_intensity * (2 if len(images) == 4 else 1)
+        for start in range(0, height, tile_rows):
+            band = [img[start:start + tile_rows] for img in images]
+            total = np.add(band[0], band[1], dtype=np.float32)
+            for img in band[2:]:
+                total += img
+            valid = total > threshold
+            if saturation_level is not None:
+                for img in band:
+                    valid &= img < saturation_level
+            mask[start:start + tile_rows] = valid
+        if user_mask is not None:
+            if user_mask.shape != mask.shape:
+                raise ValueError(f"Mask is {user_mask.shape[1]}x{user_mask.shape[0]}, "
+                                 f"images are {mask.shape[1]}x{mask.shape[0]}")
+            mask &= user_mask.astype(bool)
+        return mask
     
     @staticmethod
-    def compute_polarization_metrics(stokes: np.ndarray) -> Dict[str, np.ndarray]:
-        """Compute all polarization metrics from Stokes parameters"""
-        S0, S1, S2 = stokes[..., 0], stokes[..., 1], stokes[..., 2]
+    def _metrics_on_pixels(S0: np.ndarray, S1: np.ndarray, S2: Optional[np.ndarray]) -> tuple:
+        """DOP, orientation and ellipticity for pixels that all have S0 > 0"""
+        if S2 is None:
+            # Only the linear 0°/90° component is known: orientation is either 0° or 90°
+            dop = np.abs(S1) / S0
+            orientation_angle = np.where(S1 < 0, 90.0, 0.0).astype(S1.dtype)
+            ellipticity_angle = None
+        else:
+            polarized = np.hypot(S1, S2)
+            
+            # Degree of Polarization (DOP)
+            dop = polarized / S0
+            
+            # Orientation Angle (OA) in degrees
+            orientation_angle = np.arctan2(S2, S1)
+            orientation_angle *= 0.5 * 180 / np.pi
+            
+            # Ellipticity Angle (EA) in degrees; zero where there is no polarized light
+            ratio = np.divide(S2, polarized, out=np.zeros_like(polarized), where=polarized > 0)
+            ellipticity_angle = np.arcsin(np.clip(ratio, -1, 1, out=ratio), out=ratio)
+            ellipticity_angle *= 0.5 * 180 / np.pi
         
-        # Avoid division by zero
-        S0_safe = S0 + 1e-8
+        np.clip(dop, 0, 1, out=dop)
+        return dop, orientation_angle, ellipticity_angle
+    
+    @staticmethod
+    def compute_polarization_metrics(stokes, mask: Optional[np.ndarray] = None,
+                                     fill_value: float = np.nan) -> Dict[str, Optional[np.ndarray]]:
+        """Compute all polarization metrics from Stokes parameters.
         
-        # Degree of Polarization (DOP)
-        dop = np.sqrt(S1**2 + S2**2) / S0_safe
+        Accepts a StokesImage or a stacked (H, W, 3) array. DOP and the angles are
+        only computed where ``mask`` is true (default: S0 > 0) and set to
+        ``fill_value`` elsewhere. Metrics that depend on an absent S2 are None.
+        """
+        if not isinstance(stokes, StokesImage):
+            stokes = StokesImage.from_array(np.asarray(stokes))
+        S0, S1, S2 = stokes.s0, stokes.s1, stokes.s2
         
-        # Orientation Angle (OA) in degrees
-        orientation_angle = 0.5 * np.arctan2(S2, S1 + 1e-8) * (180 / np.pi)
+        valid = S0 > 0
+        if mask is not None:
+            valid &= mask
         
-        # Ellipticity Angle (EA) in degrees
-        ellipticity_angle = 0.5 * np.arcsin(S2 / (dop * S0_safe + 1e-8)) * (180 / np.pi)
-        ellipticity_angle = np.nan_to_num(ellipticity_angle, nan=0.0)
+        n_valid = np.count_nonzero(valid)
+        if n_valid == valid.size:
+            dop, orientation_angle, ellipticity_angle = PolarizationProcessor._metrics_on_pixels(S0, S1, S2)
+        elif n_valid < SPARSE_FRACTION * valid.size:
+            # Compress to the informative pixels, compute there and scatter back
+            planes = PolarizationProcessor._metrics_on_pixels(
+                S0[valid], S1[valid], None if S2 is None else S2[valid]
+            )
+            dop, orientation_angle, ellipticity_angle = (
+                None if values is None else PolarizationProcessor._scatter(values, valid, fill_value)
+                for values in planes
+            )
+        else:
+            # Mostly valid: compute densely (S0 <= 0 pixels give inf/NaN) and blank the rest
+            with np.errstate(divide='ignore', invalid='ignore'):
+                planes = PolarizationProcessor._metrics_on_pixels(S0, S1, S2)
+            invalid = ~valid
+            for values in planes:
+                if values is not None:
+                    np.copyto(values, fill_value, where=invalid)
+            dop, orientation_angle, ellipticity_angle = planes
         
         return {
-            'dop': np.clip(dop, 0, 1),
+            'dop': dop,
             'orientation_angle': orientation_angle,
             'ellipticity_angle': ellipticity_angle,
             'S0': S0,
             'S1': S1,
             'S2': S2
         }
+    
+    @staticmethod
+    def _scatter(values: np.ndarray, mask: np.ndarray, fill_value: float) -> np.ndarray:
+        out = np.full(mask.shape, fill_value, dtype=values.dtype)
+        out[mask] = values
+        return out
+    
+    @staticmethod
+    def compute_metrics_tiled(images: list, tile_rows: int = 512,
+                              should_stop: Optional[Callable[[], bool]] = None,
+                              on_progress: Optional[Callable[[float], None]] = None,
+                              dtype=None, mask: Optional[np.ndarray] = None,
+                              fill_value: float = np.nan) -> Dict[str, Optional[np.ndarray]]:
+        """Compute metrics from 4 (0/45/90/135) or 2 (0/90) images one band of rows at a time.
+        
+        ``dtype`` sets the storage type of the bounded planes (e.g. float16 to halve them);
+        the Stokes planes keep their computed type. ``mask`` and ``fill_value`` are
+        applied as in compute_polarization_metrics.
+        """
+        if len(images) not in (2, 4):
+            raise ValueError("Need 4 images (single) or 2 images (dual) for Stokes computation")
+        
+        height = images[0].shape[0]
+        metrics = None
+        for start in range(0, height, tile_rows):
+            if should_stop is not None and should_stop():
+                raise ComputationCancelled()
+            
+            band = [img[start:start + tile_rows] for img in images]
+            if len(band) == 4:
+                stokes = PolarizationProcessor.compute_stokes_single(band)
+            else:
+                stokes = PolarizationProcessor.compute_stokes_dual(*band)
+            band_mask = None if mask is None else mask[start:start + tile_rows]
+            tile = PolarizationProcessor.compute_polarization_metrics(stokes, band_mask, fill_value)
+            
+            if metrics is None:
+                metrics = {key: None if value is None else
+                           np.empty((height,) + value.shape[1:],
+                                    dtype=dtype if dtype is not None and key in BOUNDED_METRICS else value.dtype)
+                           for key, value in tile.items()}
+            for key, value in tile.items():
+                if value is not None:
+                    metrics[key][start:start + tile_rows] = value
+            # Release this band before the next one is computed
+            del stokes, tile, value
+            if on_progress is not None:
+                on_progress(min(1.0, (start + tile_rows) / height))
+        
+        return metrics
@@ -0,0 +1,203 @@
+import math
+import threading
+import warnings
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Optional
+
+import numpy as np
+
+from utils.memory_planner import BIN_BAND_PIXELS, GLOBAL_BUDGET, ExecutionPlan
+from utils.polarization import ComputationCancelled, PolarizationProcessor
+from utils.registration import register_frames, valid_region
+
+# Angles of the four single-mode frames, in input order
+FRAME_ANGLES = (0, 45, 90, 135)
+
+# Longest side of the preview computation
+PREVIEW_MAX_SIDE = 256
+
+# Shared across sessions so refinements cannot pile up unbounded threads
+_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="refine")
+
+
+def downsample(image: np.ndarray, max_side: int = PREVIEW_MAX_SIDE) -> np.ndarray:
+    """Block-average an image so its longest side is at most max_side"""
+    return bin_image(image, max(1, math.ceil(max(image.shape[:2]) / max_side)))
+
+
+def bin_image(image: np.ndarray, factor: int) -> np.ndarray:
+    """Average non-overlapping factor x factor blocks into float32.
+
+    Works through row bands so a uint8/uint16 (or memory-mapped) input is never
+    converted to float32 all at once.
+    """
+    if factor == 1:
+        return np.asarray(image, dtype=np.float32)
+    height = image.shape[0] // factor
+    width = image.shape[1] // factor
+    binned = np.empty((height, width), dtype=np.float32)
+    band_rows = max(1, BIN_BAND_PIXELS // (factor * factor * max(1, width)))
+    for start in range(0, height, band_rows):
+        stop = min(start + band_rows, height)
+        blocks = np.asarray(image[start * factor:stop * factor, :width * factor], dtype=np.float32)
+        blocks = blocks.reshape(stop - start, factor, width, factor)
+        if np.isnan(blocks).any():
+            # Masked-out (NaN) pixels must not blank out the whole block
+            with warnings.catch_warnings():
+                warnings.simplefilter("ignore", RuntimeWarning)
+                binned[start:stop] = np.nanmean(blocks, axis=(1, 3))
+        else:
+            blocks.mean(axis=(1, 3), out=binned[start:stop])
+    return binned
+
+
+def bin_mask(mask: np.ndarray, factor: int) -> np.ndarray:
+    """A binned pixel is valid only if every pixel in its block is"""
+    if factor == 1:
+        return mask
+    height = mask.shape[0] // factor * factor
+    width = mask.shape[1] // factor * factor
+    blocks = mask[:height, :width].reshape(height // factor, factor, width // factor, factor)
+    return blocks.all(axis=(1, 3))
+
+
+def _input_mask(inputs: list, user_mask: Optional[np.ndarray], saturation_level: Optional[float],
+                factor: int) -> Optional[np.ndarray]:
+    """User mask and unsaturated pixels judged at input resolution, reduced to the binned grid"""
+    if user_mask is not None and user_mask.shape != inputs[0].shape[:2]:
+        raise ValueError(f"Mask is {user_mask.shape[1]}x{user_mask.shape[0]}, "
+                         f"images are {inputs[0].shape[1]}x{inputs[0].shape[0]}")
+    keep = user_mask
+    if saturation_level is not None:
+        keep = PolarizationProcessor.compute_unsaturated_mask(inputs, saturation_level)
+        if user_mask is not None:
+            keep &= user_mask.astype(bool)
+    return None if keep is None else bin_mask(keep, factor)
+
+
+def analyse(images: list, align: bool, plan: ExecutionPlan = None, mask_options: dict = None,
+            on_notice: Optional[Callable[[str], None]] = None, **tiled_kwargs) -> tuple:
+    """Optionally bin and register the frames, then compute metrics as the plan says.
+    
+    ``mask_options`` holds compute_validity_mask arguments. Saturation and the user
+    mask are judged on the input frames, before binning or registration can average
+    saturated pixels away, and reduced with bin_mask. Registration masks out the
+    border its circular shift wrapped around; frames it could not align are left
+    as they are and reported through ``on_notice``. Returns (images, metrics, mask).
+    """
+    factor = plan.bin_factor if plan is not None else 1
+    inputs = images
+    if factor > 1:
+        images = [bin_image(img, factor) for img in images]
+    mask = None
+    if align and len(images) == 4:
+        images, shifts, rejected = register_frames(images)
+        mask = valid_region(images[0].shape, shifts)
+        if on_notice is not None:
+            for index, reason in rejected.items():
+                on_notice(f"{FRAME_ANGLES[index]}° frame left unaligned: {reason}")
+    
+    if mask_options:
+        options = dict(mask_options)
+        user_mask = options.pop('user_mask', None)
+        saturation_level = options.pop('saturation_level', None)
+        options['user_mask'] = _input_mask(inputs, user_mask, saturation_level, factor)
+        validity = PolarizationProcessor.compute_validity_mask(images, **options)
+        mask = validity if mask is None else mask & validity
+    
+    if plan is not None and plan.tile_rows is None:
+        if len(images) == 4:
+            stokes = PolarizationProcessor.compute_stokes_single(images)
+        else:
+            stokes = PolarizationProcessor.compute_stokes_dual(*images)
+        return images, PolarizationProcessor.compute_polarization_metrics(stokes, mask), mask
+    
+    if plan is not None:
+        tiled_kwargs.update(tile_rows=plan.tile_rows, dtype=plan.dtype)
+    metrics = PolarizationProcessor.compute_metrics_tiled(images, mask=mask, **tiled_kwargs)
+    return images, metrics, mask
+
+
+def retained_bytes(*groups) -> int:
+    """Bytes of the distinct in-memory arrays in the given lists and dicts; memory maps are not counted"""
+    arrays = {}
+    for group in groups:
+        values = group.values() if isinstance(group, dict) else group
+        for value in values:
+            if isinstance(value, np.ndarray) and not isinstance(value, np.memmap):
+                arrays[id(value)] = value.nbytes
+    return sum(arrays.values())
+
+
+def compute_preview(images: list, align: bool, mask_options: dict = None,
+                    on_notice: Optional[Callable[[str], None]] = None) -> tuple:
+    """Fast low-resolution result; returns (metrics, mask, downsampling factor)"""
+    factor = max(1, math.ceil(max(images[0].shape[:2]) / PREVIEW_MAX_SIDE))
+    plan = ExecutionPlan("binned", 0, tile_rows=PREVIEW_MAX_SIDE, bin_factor=factor)
+    _small, metrics, mask = analyse(images, align, plan, mask_options, on_notice)
+    return metrics, mask, factor
+
+
+class RefinementJob:
+    """Full-resolution analysis on a background thread that can be cancelled between row bands.
+
+    A finished job keeps its result, and the inputs it was given, counted against
+    GLOBAL_BUDGET until it is cancelled or garbage-collected with its session.
+    """
+
+    def __init__(self, images: list, align: bool, plan: ExecutionPlan, mask_options: dict = None):
+        self.images = images
+        self.plan = plan
+        self.progress = 0.0
+        self.queued = False
+        # Messages about the analysis the user should see, e.g. frames left unaligned
+        self.notices = []
+        self._cancelled = threading.Event()
+        self._lock = threading.Lock()
+        self._release = None
+        self._future = _executor.submit(self._run, images, align, mask_options)
+
+    def _run(self, images: list, align: bool, mask_options: dict) -> tuple:
+        if self._cancelled.is_set():
+            raise ComputationCancelled()
+        # Waits here while other sessions hold the shared memory budget
+        with GLOBAL_BUDGET.reserve(self.plan.peak_bytes, should_stop=self._cancelled.is_set,
+                                   on_wait=self._set_queued):
+            self.queued = False
+            result = analyse(
+                images, align, self.plan, mask_options, self.notices.append,
+                should_stop=self._cancelled.is_set,
+                on_progress=self._set_progress
+            )
+            # Held before the peak reservation ends so no other job can claim the memory
+            self._hold(retained_bytes(images, *result[:2], [result[2]]))
+            return result
+
+    def _hold(self, nbytes: int):
+        with self._lock:
+            if self._cancelled.is_set():
+                raise ComputationCancelled()
+            GLOBAL_BUDGET.hold(nbytes)
+            self._release = weakref.finalize(self, GLOBAL_BUDGET.release, nbytes)
+
+    def _set_queued(self):
+        self.queued = True
+
+    def _set_progress(self, value: float):
+        self.progress = value
+
+    def cancel(self):
+        """Stop the job and give back the memory its result was holding"""
+        with self._lock:
+            self._cancelled.set()
+            if self._release is not None:
+                self._release()
+        self._future.cancel()
+
+    def done(self) -> bool:
+        return self._future.done()
+
+    def result(self) -> tuple:
+        """(images, metrics, mask) at full resolution; raises if the job failed or was cancelled"""
+        return self._future.result()
@@ -0,0 +1,176 @@
+import numpy as np
+from scipy import fft as sp_fft
+
+# Shifts smaller than this (in pixels) are treated as already aligned
+MIN_SHIFT = 0.01
+
+# Width (in pixels) of the Gaussian that smooths the correlation peak. Whitened
+# spectra give a sinc-like peak that noise and interpolation bias; a Gaussian
+# peak is robust and its sub-pixel centre follows from three samples.
+PEAK_SIGMA = 2.5
+
+# Largest accepted shift, as a fraction of the shorter side (but never below
+# MIN_SHIFT_LIMIT pixels). Sequential captures drift by a few pixels at most;
+# a larger peak means the frames did not match.
+MAX_SHIFT_FRACTION = 0.02
+MIN_SHIFT_LIMIT = 2.0
+
+# Correlation peak over the mean absolute correlation below which a frame is
+# left unaligned. Matching frames score 20 and up, even when noisy or at a
+# different contrast; unrelated or anti-correlated frames stay below 10.
+MIN_PEAK_TO_MEAN = 12.0
+
+# Fraction of each side tapered by the correlation window. Without it the image
+# edges correlate with themselves and pull the peak of non-periodic frames
+# towards zero shift.
+TAPER_FRACTION = 0.2
+
+
+def _subpixel_peak(corr: np.ndarray) -> np.ndarray:
+    """Locate the correlation peak and refine it with a Gaussian (log-parabola) fit per axis"""
+    peak = np.unravel_index(np.argmax(corr), corr.shape)
+    shift = np.empty(2)
+    for axis, (i, n) in enumerate(zip(peak, corr.shape)):
+        before = list(peak)
+        after = list(peak)
+        before[axis] = (i - 1) % n
+        after[axis] = (i + 1) % n
+        c_minus, c_zero, c_plus = (
+            np.log(max(corr[index], 1e-12)) for index in (tuple(before), peak, tuple(after))
+        )
+        denom = c_minus - 2 * c_zero + c_plus
+        offset = 0.5 * (c_minus - c_plus) / denom if denom < 0 else 0.0
+        position = i + offset
+        # Wrap to a signed shift
+        shift[axis] = position - n if position > n / 2 else position
+    return shift
+
+
+def _tukey(n: int, alpha: float) -> np.ndarray:
+    """Tukey (tapered cosine) window: flat in the middle, a half-cosine over alpha * n at the ends"""
+    if n < 2 or alpha <= 0:
+        return np.ones(n, dtype=np.float32)
+    x = np.arange(n) / (n - 1)
+    edge = np.minimum(x, 1 - x)
+    window = np.where(edge < alpha / 2, 0.5 * (1 - np.cos(2 * np.pi * edge / alpha)), 1.0)
+    return window.astype(np.float32)
+
+
+def _apodize(image: np.ndarray, window_y: np.ndarray, window_x: np.ndarray) -> np.ndarray:
+    """Zero-mean, windowed float32 copy of a frame for correlation"""
+    frame = np.asarray(image, dtype=np.float32)
+    frame = frame - np.float32(frame.mean(dtype=np.float64))
+    frame *= window_y
+    frame *= window_x
+    return frame
+
+
+def _phase_ramp(shape: tuple, shift: np.ndarray) -> tuple:
+    """Separable Fourier-shift factors for a real-input (rfft2) spectrum"""
+    height, width = shape
+    ky = sp_fft.fftfreq(height).astype(np.float32)
+    kx = sp_fft.rfftfreq(width).astype(np.float32)
+    ramp_y = np.exp(-2j * np.pi * ky * shift[0]).astype(np.complex64)
+    ramp_x = np.exp(-2j * np.pi * kx * shift[1]).astype(np.complex64)
+    return ramp_y[:, None], ramp_x[None, :]
+
+
+def _gaussian_weight(shape: tuple, sigma: float) -> tuple:
+    """Separable spectral low-pass that turns the correlation delta into a Gaussian"""
+    height, width = shape
+    scale = (2 * np.pi * sigma) ** 2 / 2
+    ky = sp_fft.fftfreq(height)
+    kx = sp_fft.rfftfreq(width)
+    weight_y = np.exp(-scale * ky ** 2).astype(np.float32)
+    weight_x = np.exp(-scale * kx ** 2).astype(np.float32)
+    return weight_y[:, None], weight_x[None, :]
+
+
+def _check_peak(corr: np.ndarray, shift: np.ndarray, limit: float):
+    """Why a correlation peak cannot be trusted, or None when it can"""
+    if np.any(np.abs(shift) > limit):
+        return f"offset ({shift[0]:.1f}, {shift[1]:.1f}) px exceeds the {limit:.0f} px limit"
+    ratio = float(corr.max() / max(float(np.abs(corr).mean()), 1e-12))
+    if ratio < MIN_PEAK_TO_MEAN:
+        return f"no clear correlation peak (peak/mean {ratio:.1f} < {MIN_PEAK_TO_MEAN:g})"
+    return None
+
+
+def register_frames(images: list, workers: int = -1) -> tuple:
+    """Align every frame to the first one using phase correlation.
+
+    Returns the registered frames (the reference is passed through untouched),
+    the (dy, dx) shift applied to each frame and a dict of frame index -> reason
+    for frames left unshifted because their correlation peak was implausible.
+    """
+    reference, moving = images[0], images[1:]
+    shape = reference.shape
+    if any(img.shape != shape for img in moving):
+        raise ValueError("All frames must have the same shape for registration")
+    if not moving:
+        return list(images), [np.zeros(2)], {}
+    limit = max(MIN_SHIFT_LIMIT, MAX_SHIFT_FRACTION * min(shape))
+
+    # Correlate zero-mean, tapered copies so the frame borders do not bias the peak
+    window_y = _tukey(shape[0], TAPER_FRACTION)[:, None]
+    window_x = _tukey(shape[1], TAPER_FRACTION)[None, :]
+    ref_fft = sp_fft.rfft2(_apodize(reference, window_y, window_x), workers=workers)
+    stack = np.empty((len(moving),) + shape, dtype=np.float32)
+    for i, img in enumerate(moving):
+        stack[i] = _apodize(img, window_y, window_x)
+    cross_power = sp_fft.rfft2(stack, axes=(-2, -1), workers=workers, overwrite_x=True)
+    del stack
+
+    # Normalised cross-power spectrum; its inverse peaks at the shift back onto the reference
+    np.conj(cross_power, out=cross_power)
+    cross_power *= ref_fft[None]
+    del ref_fft
+    cross_power /= np.abs(cross_power) + np.float32(1e-12)
+    weight_y, weight_x = _gaussian_weight(shape, PEAK_SIGMA)
+    cross_power *= weight_y
+    cross_power *= weight_x
+    correlation = sp_fft.irfft2(cross_power, s=shape, axes=(-2, -1), workers=workers)
+    del cross_power
+
+    shifts = [np.zeros(2)]
+    registered = [images[0]]
+    rejected = {}
+    for i, img in enumerate(moving):
+        shift = _subpixel_peak(correlation[i])
+        reason = _check_peak(correlation[i], shift, limit)
+        if reason is not None:
+            rejected[i + 1] = reason
+            shift = np.zeros(2)
+        shifts.append(shift)
+        if np.all(np.abs(shift) < MIN_SHIFT):
+            registered.append(img)
+            continue
+        # The untapered frame is resampled, one frame at a time
+        spectrum = sp_fft.rfft2(np.asarray(img, dtype=np.float32), workers=workers)
+        ramp_y, ramp_x = _phase_ramp(shape, shift)
+        spectrum *= ramp_y
+        spectrum *= ramp_x
+        registered.append(sp_fft.irfft2(spectrum, s=shape, workers=workers))
+
+    return registered, shifts, rejected
+
+
+def valid_region(shape: tuple, shifts: list):
+    """Pixels every registered frame covers with real data, or None when nothing moved.
+
+    The Fourier shift is circular: content pushed past one edge wraps around to
+    the opposite one, so the rows and columns it lands in hold no valid data.
+    """
+    mask = None
+    for shift in shifts:
+        if np.all(np.abs(shift) < MIN_SHIFT):
+            continue
+        if mask is None:
+            mask = np.ones(shape, dtype=bool)
+        for axis, offset in enumerate(shift):
+            lost = min(int(np.ceil(abs(offset) - MIN_SHIFT)), shape[axis])
+            if lost == 0:
+                continue
+            edge = slice(0, lost) if offset > 0 else slice(shape[axis] - lost, shape[axis])
+            mask[(edge, slice(None)) if axis == 0 else (slice(None), edge)] = False
+    return mask
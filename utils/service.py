@@ -0,0 +1,264 @@
+import io
+import json
+import math
+import os
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+import numpy as np
+from PIL import Image
+
+from utils.file_handling import FileExporter
+from utils.memory_planner import GLOBAL_BUDGET, MB, plan_job
+from utils.progressive import analyse
+from utils.uploads import image_to_array
+
+# Largest request body accepted; larger requests are refused before they are read
+MAX_BODY_BYTES = int(float(os.environ.get("POLARVISION_SERVICE_MAX_BODY_MB", 256)) * MB)
+# Idle keep-alive connections are closed after this many seconds
+KEEPALIVE_TIMEOUT = 15
+
+# Angle of each pixel in a 2x2 super-pixel of a division-of-focal-plane sensor
+DOFP_PATTERN = ((90, 45), (135, 0))
+ANGLES = (0, 45, 90, 135)
+
+NPY_MAGIC = b'\x93NUMPY'
+
+
+class RequestError(ValueError):
+    """A request the service cannot process; carries the HTTP status to answer with"""
+
+    def __init__(self, message: str, status: int = 400):
+        super().__init__(message)
+        self.status = status
+
+
+def split_dofp(frame: np.ndarray, pattern: tuple = DOFP_PATTERN) -> list:
+    """Split a polarization mosaic into its 0/45/90/135 sub-images (half resolution each)"""
+    if frame.ndim != 2:
+        raise RequestError("A DoFP frame must be a single 2D mosaic")
+    height, width = frame.shape[0] // 2 * 2, frame.shape[1] // 2 * 2
+    if height == 0 or width == 0:
+        raise RequestError("A DoFP frame needs at least 2x2 pixels")
+    offsets = {angle: (row, col) for row, angles in enumerate(pattern) for col, angle in enumerate(angles)}
+    return [frame[offsets[angle][0]:height:2, offsets[angle][1]:width:2] for angle in ANGLES]
+
+
+def decode_array(body: bytes) -> np.ndarray:
+    """Decode a .npy payload or an image file (multi-page TIFF pages become a stack)"""
+    if body.startswith(NPY_MAGIC):
+        try:
+            return np.load(io.BytesIO(body), allow_pickle=False)
+        except (ValueError, EOFError) as exc:
+            raise RequestError(f"Invalid .npy payload: {exc}")
+    try:
+        with Image.open(io.BytesIO(body)) as img:
+            pages = []
+            for index in range(getattr(img, 'n_frames', 1)):
+                img.seek(index)
+                pages.append(image_to_array(img))
+    except Image.DecompressionBombError as exc:
+        raise RequestError(str(exc), status=413)
+    except (OSError, SyntaxError, ValueError) as exc:
+        raise RequestError(f"Body is neither a .npy array nor a readable image: {exc}")
+    if len(pages) == 1:
+        return pages[0]
+    if any(page.shape != pages[0].shape for page in pages):
+        sizes = ', '.join(f"{page.shape[1]}x{page.shape[0]}" for page in pages)
+        raise RequestError(f"All pages of a multi-page image must have the same size, got {sizes}")
+    return np.stack(pages)
+
+
+def frames_from_array(data: np.ndarray, layout: str = None) -> list:
+    """Input frames from a (4|2, H, W) stack or a 2D DoFP mosaic"""
+    if data.dtype.kind not in 'biuf':
+        raise RequestError(f"Unsupported array dtype {data.dtype}; send integer or real-valued pixels")
+    if data.size == 0:
+        raise RequestError(f"Array of shape {data.shape} holds no pixels")
+    layout = layout or ('dofp' if data.ndim == 2 else 'stack')
+    if layout == 'dofp':
+        return split_dofp(data)
+    if layout != 'stack':
+        raise RequestError(f"Unknown layout '{layout}' (use stack or dofp)")
+    if data.ndim != 3 or data.shape[0] not in (2, 4):
+        raise RequestError(f"A stack must be shaped (4, H, W) for 0/45/90/135 or (2, H, W) for 0/90, got {data.shape}")
+    return list(data)
+
+
+def _flag(params: dict, name: str) -> bool:
+    return params.get(name, '0').lower() in ('1', 'true', 'yes')
+
+
+def _number(params: dict, name: str):
+    if name not in params:
+        return None
+    try:
+        return float(params[name])
+    except ValueError:
+        raise RequestError(f"Query parameter '{name}' must be a number")
+
+
+def analyse_payload(body: bytes, params: dict) -> tuple:
+    """Decode, plan and analyse one request body; returns (metrics, mask, notices)"""
+    frames = frames_from_array(decode_array(body), params.get('layout'))
+    align = _flag(params, 'align')
+    min_intensity = _number(params, 'min_intensity')
+    saturation_level = _number(params, 'saturation')
+    mask_options = None
+    if min_intensity is not None or saturation_level is not None:
+        mask_options = {'min_intensity': min_intensity or 0.0, 'saturation_level': saturation_level}
+
+    plan = plan_job(frames[0].shape, n_inputs=len(frames), input_itemsize=frames[0].dtype.itemsize,
+                    register=align, plots=False, masked=saturation_level is not None)
+    if plan.rejected:
+        raise RequestError(plan.message, status=413)
+    # Shares the process-wide budget with every other request (and the app, when co-hosted)
+    notices = []
+    with GLOBAL_BUDGET.reserve(plan.peak_bytes):
+        _images, metrics, mask = analyse(frames, align, plan, mask_options, notices.append)
+    return metrics, mask, notices
+
+
+def _json_number(value: float):
+    return None if value is None or not math.isfinite(value) else value
+
+
+def encode_stats(metrics: dict, mask: np.ndarray = None, notices: list = ()) -> bytes:
+    summary = FileExporter.accumulate_statistics(metrics, mask)
+    rows = [{key: _json_number(value) if key != 'Metric' else value for key, value in row.items()}
+            for row in summary.rows()]
+    shape = next(value.shape for value in metrics.values() if value is not None)
+    return json.dumps({
+        'shape': list(shape),
+        'valid_fraction': 1.0 if mask is None else float(mask.mean()),
+        'notices': list(notices),
+        'metrics': rows
+    }).encode()
+
+
+def encode_metrics(metrics: dict, mask: np.ndarray, params: dict) -> bytes:
+    """One metric as raw .npy, or every measured plane (plus the mask) as an .npz"""
+    buffer = io.BytesIO()
+    if params.get('format', 'npz') == 'npy':
+        name = params.get('metric')
+        if metrics.get(name) is None:
+            measured = ', '.join(key for key, value in metrics.items() if value is not None)
+            raise RequestError(f"format=npy needs metric= one of {measured}")
+        np.save(buffer, metrics[name], allow_pickle=False)
+        return buffer.getvalue()
+
+    arrays = {key: value for key, value in metrics.items() if value is not None}
+    if mask is not None:
+        arrays['mask'] = mask
+    if params.get('compress', '1') == '0':
+        np.savez(buffer, **arrays)
+    else:
+        np.savez_compressed(buffer, **arrays)
+    return buffer.getvalue()
+
+
+class AnalysisHandler(BaseHTTPRequestHandler):
+    """POST /metrics and /stats with an array or image body; GET /healthz"""
+    protocol_version = "HTTP/1.1"
+    server_version = "PolarVision/1.0"
+    timeout = KEEPALIVE_TIMEOUT
+
+    def handle_expect_100(self):
+        # Clients sending "Expect: 100-continue" learn about an oversized body before uploading it
+        length = self.headers.get('Content-Length', '')
+        if length.isdigit() and int(length) > self.server.max_body_bytes:
+            self.close_connection = True
+            self._send_error(413, f"Body of {length} bytes exceeds the {self.server.max_body_bytes} byte limit")
+            return False
+        return super().handle_expect_100()
+
+    def do_GET(self):
+        if urlsplit(self.path).path == '/healthz':
+            self._send(200, json.dumps({'status': 'ok', 'workers': self.server.workers}).encode(),
+                       'application/json')
+        else:
+            self._send_error(404, f"No such endpoint: {self.path}")
+
+    def do_POST(self):
+        url = urlsplit(self.path)
+        params = {key: values[-1] for key, values in parse_qs(url.query).items()}
+        if url.path not in ('/metrics', '/stats'):
+            self._discard_body()
+            self._send_error(404, f"No such endpoint: {url.path}")
+            return
+
+        length = self.headers.get('Content-Length', '')
+        if not length.isdigit():
+            self.close_connection = True
+            self._send_error(411, "A numeric Content-Length is required")
+            return
+        length = int(length)
+        if length > self.server.max_body_bytes:
+            # The body is left unread, so this connection cannot be reused
+            self.close_connection = True
+            self._send_error(413, f"Body of {length} bytes exceeds the {self.server.max_body_bytes} byte limit")
+            return
+        body = self.rfile.read(length)
+
+        try:
+            # Only the analysis is bounded; idle and reading connections take no slot
+            with self.server.analysis_slots:
+                metrics, mask, notices = analyse_payload(body, params)
+                if url.path == '/stats':
+                    payload, content_type, headers = encode_stats(metrics, mask, notices), 'application/json', {}
+                else:
+                    # Binary bodies carry the notices in a header instead
+                    payload, content_type = encode_metrics(metrics, mask, params), 'application/octet-stream'
+                    headers = {'X-PolarVision-Notices': json.dumps(notices)} if notices else {}
+                del metrics, mask
+            self._send(200, payload, content_type, headers)
+        except RequestError as exc:
+            self._send_error(exc.status, str(exc))
+        except MemoryError as exc:
+            self._send_error(503, str(exc))
+        except Exception as exc:
+            # Anything else is a bug; log it and still answer in JSON
+            self.log_error("Failed to analyse %s: %r", self.path, exc)
+            self._send_error(500, f"Internal error: {type(exc).__name__}")
+
+    def _discard_body(self):
+        length = self.headers.get('Content-Length') or '0'
+        if not length.isdigit() or int(length) > self.server.max_body_bytes:
+            # The body cannot be skipped reliably, so the connection is not reused
+            self.close_connection = True
+        else:
+            self.rfile.read(int(length))
+
+    def _send(self, status: int, payload: bytes, content_type: str, headers: dict = None):
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.send_header('Content-Length', str(len(payload)))
+        if self.close_connection:
+            self.send_header('Connection', 'close')
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def _send_error(self, status: int, message: str):
+        self._send(status, json.dumps({'error': message}).encode(), 'application/json')
+
+    def log_message(self, format, *args):
+        if not self.server.quiet:
+            super().log_message(format, *args)
+
+
+class AnalysisServer(ThreadingHTTPServer):
+    """HTTP server with a thread per connection and at most ``workers`` analyses running at once"""
+    daemon_threads = True
+
+    def __init__(self, address: tuple, workers: int = 4, max_body_bytes: int = MAX_BODY_BYTES,
+                 quiet: bool = False):
+        super().__init__(address, AnalysisHandler)
+        self.workers = workers
+        self.max_body_bytes = max_body_bytes
+        self.quiet = quiet
+        # Analyses queue here when every slot is busy; keep-alive connections
+        # waiting for their next request never hold one
+        self.analysis_slots = threading.BoundedSemaphore(workers)
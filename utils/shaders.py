@@ -1,12 +1,6 @@
-import streamlit as st
-import numpy as np
+FONT_STYLESHEET = "https://fonts.googleapis.com/css2?family=Inter:wght@300;400;500;600;700&display=swap"
 
-def get_shader_background():
-    """WebGL-inspired shader background using CSS"""
-    return """
-    <style>
-    @import url('https://fonts.googleapis.com/css2?family=Inter:wght@300;400;500;600;700&display=swap');
-    
+SHADER_CSS = """
     .main {
         background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
         background-attachment: fixed;
@@ -115,7 +109,15 @@ def get_shader_background():
         0%, 100% { opacity: 1; transform: scale(1); }
         50% { opacity: 0.7; transform: scale(1.2); }
     }
-    </style>
-    
-    <div class="shader-background"></div>
-    """
\ No newline at end of file
+"""
+
+
+def get_shader_background():
+    """WebGL-inspired shader background using CSS"""
+    return (
+        "<style>\n"
+        f"@import url('{FONT_STYLESHEET}');\n"
+        + SHADER_CSS +
+        "</style>\n"
+        '<div class="shader-background"></div>\n'
+    )
@@ -0,0 +1,301 @@
+import math
+from functools import reduce
+from typing import Dict, Iterable, Optional
+
+import numpy as np
+
+# Metrics whose values are axial angles in degrees (θ and θ + 180° are the same direction)
+AXIAL_METRICS = ('orientation_angle',)
+
+SKETCH_BINS = 4096
+
+
+def _finite(values) -> np.ndarray:
+    """Flattened float64 copy of the finite values"""
+    values = np.asarray(values, dtype=np.float64).ravel()
+    return values[np.isfinite(values)]
+
+
+class MomentAccumulator:
+    """Count, mean and variance updated batch by batch (Welford/Chan)"""
+
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+
+    def update(self, values) -> 'MomentAccumulator':
+        return self._add(_finite(values))
+
+    def _add(self, values: np.ndarray) -> 'MomentAccumulator':
+        if values.size:
+            batch = MomentAccumulator()
+            batch.count = values.size
+            batch.mean = float(values.mean())
+            batch.m2 = float(np.square(values - batch.mean).sum())
+            self.merge(batch)
+        return self
+
+    def merge(self, other: 'MomentAccumulator') -> 'MomentAccumulator':
+        """Chan et al. pairwise combination; exact up to rounding and order-independent"""
+        if other.count == 0:
+            return self
+        total = self.count + other.count
+        delta = other.mean - self.mean
+        self.mean += delta * other.count / total
+        self.m2 += other.m2 + delta * delta * self.count * other.count / total
+        self.count = total
+        return self
+
+    @property
+    def variance(self) -> float:
+        """Population variance, matching np.var"""
+        return self.m2 / self.count if self.count else math.nan
+
+    @property
+    def std(self) -> float:
+        return math.sqrt(self.variance)
+
+
+class ExtremaAccumulator:
+    """Running minimum and maximum"""
+
+    def __init__(self):
+        self.min = math.inf
+        self.max = -math.inf
+
+    def update(self, values) -> 'ExtremaAccumulator':
+        return self._add(_finite(values))
+
+    def _add(self, values: np.ndarray) -> 'ExtremaAccumulator':
+        if values.size:
+            self.min = min(self.min, float(values.min()))
+            self.max = max(self.max, float(values.max()))
+        return self
+
+    def merge(self, other: 'ExtremaAccumulator') -> 'ExtremaAccumulator':
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        return self
+
+
+class QuantileSketch:
+    """Fixed-size histogram over [-2**scale, 2**scale) for approximate quantiles.
+
+    The range doubles (merging neighbouring bins) whenever a value falls outside
+    it, so two sketches can always be brought to a common range and merged by
+    adding counts. Quantiles are exact to within one bin width, 2**(scale + 1) / bins,
+    and never leave the observed [min, max]; data that all falls in one bin (e.g. a
+    constant plane) is interpolated between its min and max instead of the bin edges.
+    """
+
+    def __init__(self, bins: int = SKETCH_BINS):
+        if bins % 4:
+            raise ValueError("Sketch bin count must be a multiple of 4")
+        self.bins = bins
+        self.scale = None
+        self.counts = np.zeros(bins, dtype=np.int64)
+        self.min = math.inf
+        self.max = -math.inf
+
+    @property
+    def count(self) -> int:
+        return int(self.counts.sum())
+
+    def _grow(self, scale: int):
+        """Double the range until it reaches 2**scale"""
+        if self.scale is None:
+            self.scale = scale
+            return
+        while self.scale < scale:
+            # Old bins pair up into the middle half of the doubled range
+            quarter = self.bins // 4
+            merged = self.counts.reshape(-1, 2).sum(axis=1)
+            self.counts = np.zeros_like(self.counts)
+            self.counts[quarter:quarter + merged.size] = merged
+            self.scale += 1
+
+    def update(self, values) -> 'QuantileSketch':
+        return self._add(_finite(values))
+
+    def _add(self, values: np.ndarray) -> 'QuantileSketch':
+        if values.size == 0:
+            return self
+        lowest, highest = float(values.min()), float(values.max())
+        self.min, self.max = min(self.min, lowest), max(self.max, highest)
+        peak = max(-lowest, highest)
+        # Smallest power of two strictly above every value, but no finer than 2**-20
+        self._grow(max(-20, math.frexp(peak)[1]))
+        limit = 2.0 ** self.scale
+        index = ((values + limit) * (self.bins / (2 * limit))).astype(np.int64)
+        np.clip(index, 0, self.bins - 1, out=index)
+        self.counts += np.bincount(index, minlength=self.bins)
+        return self
+
+    def merge(self, other: 'QuantileSketch') -> 'QuantileSketch':
+        if other.bins != self.bins:
+            raise ValueError("Cannot merge sketches with different bin counts")
+        if other.scale is None:
+            return self
+        self.min, self.max = min(self.min, other.min), max(self.max, other.max)
+        other_counts = other.counts
+        if self.scale is None or self.scale < other.scale:
+            self._grow(other.scale)
+        if other.scale < self.scale:
+            aligned = QuantileSketch(other.bins)
+            aligned.scale, aligned.counts = other.scale, other.counts.copy()
+            aligned._grow(self.scale)
+            other_counts = aligned.counts
+        self.counts += other_counts
+        return self
+
+    def quantile(self, q: float) -> float:
+        """Approximate q-quantile, interpolated linearly within the containing bin"""
+        total = self.count
+        if total == 0:
+            return math.nan
+        cumulative = np.cumsum(self.counts)
+        target = q * total
+        index = int(np.searchsorted(cumulative, target, side='left'))
+        index = min(index, self.bins - 1)
+        below = cumulative[index - 1] if index else 0
+        fraction = (target - below) / self.counts[index] if self.counts[index] else 0.0
+        width = 2.0 ** (self.scale + 1) / self.bins
+        # The observed extremes narrow the outermost occupied bins
+        low = max(-(2.0 ** self.scale) + index * width, self.min)
+        high = min(-(2.0 ** self.scale) + (index + 1) * width, self.max)
+        return float(min(max(low + fraction * (high - low), self.min), self.max))
+
+    @property
+    def median(self) -> float:
+        return self.quantile(0.5)
+
+
+class AxialAccumulator:
+    """Circular statistics for axial angles in degrees (period 180°)"""
+
+    def __init__(self):
+        self.count = 0
+        self.sum_cos = 0.0
+        self.sum_sin = 0.0
+
+    def update(self, degrees) -> 'AxialAccumulator':
+        return self._add(_finite(degrees))
+
+    def _add(self, degrees: np.ndarray) -> 'AxialAccumulator':
+        doubled = np.radians(degrees) * 2
+        self.count += doubled.size
+        self.sum_cos += float(np.cos(doubled).sum())
+        self.sum_sin += float(np.sin(doubled).sum())
+        return self
+
+    def merge(self, other: 'AxialAccumulator') -> 'AxialAccumulator':
+        self.count += other.count
+        self.sum_cos += other.sum_cos
+        self.sum_sin += other.sum_sin
+        return self
+
+    @property
+    def mean(self) -> float:
+        """Mean axis in degrees, in (-90, 90]"""
+        if self.count == 0:
+            return math.nan
+        return math.degrees(0.5 * math.atan2(self.sum_sin, self.sum_cos))
+
+    @property
+    def resultant_length(self) -> float:
+        """Concentration R in [0, 1]: 1 when all angles agree, 0 when uniformly spread"""
+        if self.count == 0:
+            return math.nan
+        return math.hypot(self.sum_cos, self.sum_sin) / self.count
+
+    @property
+    def dispersion(self) -> float:
+        """Circular variance 1 - R of the doubled angles"""
+        return 1.0 - self.resultant_length
+
+    @property
+    def std(self) -> float:
+        """Circular standard deviation in degrees, sqrt(-2 ln R) / 2"""
+        length = self.resultant_length
+        if math.isnan(length):
+            return math.nan
+        if length <= 0:
+            return math.inf
+        # max() keeps a perfectly concentrated sample at 0.0 rather than -0.0
+        return math.degrees(math.sqrt(max(0.0, -2 * math.log(min(length, 1.0)))) / 2)
+
+
+class MetricAccumulator:
+    """All summary statistics for one metric; axial metrics also track circular moments"""
+
+    def __init__(self, axial: bool = False):
+        self.moments = MomentAccumulator()
+        self.extrema = ExtremaAccumulator()
+        self.sketch = QuantileSketch()
+        self.axial = AxialAccumulator() if axial else None
+
+    def update(self, values) -> 'MetricAccumulator':
+        # Filter and widen once, then feed every accumulator the same values
+        values = _finite(values)
+        self.moments._add(values)
+        self.extrema._add(values)
+        self.sketch._add(values)
+        if self.axial is not None:
+            self.axial._add(values)
+        return self
+
+    def merge(self, other: 'MetricAccumulator') -> 'MetricAccumulator':
+        self.moments.merge(other.moments)
+        self.extrema.merge(other.extrema)
+        self.sketch.merge(other.sketch)
+        if self.axial is not None and other.axial is not None:
+            self.axial.merge(other.axial)
+        return self
+
+    def summary(self) -> dict:
+        if self.moments.count == 0:
+            return {'Mean': math.nan, 'Std': math.nan, 'Min': math.nan, 'Max': math.nan, 'Median': math.nan}
+        # Axial angles are summarised on the circle; a linear mean of ±90° data is meaningless
+        source = self.axial if self.axial is not None else self.moments
+        return {
+            'Mean': source.mean,
+            'Std': source.std,
+            'Min': self.extrema.min,
+            'Max': self.extrema.max,
+            'Median': self.sketch.median
+        }
+
+
+class SummaryAccumulator:
+    """Per-metric accumulators fed tile by tile or frame by frame and merged across workers"""
+
+    def __init__(self):
+        self.metrics: Dict[str, MetricAccumulator] = {}
+
+    def update(self, metrics: dict, mask: Optional[np.ndarray] = None) -> 'SummaryAccumulator':
+        """Add one tile/frame of metric planes; pixels outside mask and NaNs are skipped"""
+        for key, data in metrics.items():
+            if data is None:
+                continue
+            if key not in self.metrics:
+                self.metrics[key] = MetricAccumulator(axial=key in AXIAL_METRICS)
+            self.metrics[key].update(data[mask] if mask is not None else data)
+        return self
+
+    def merge(self, other: 'SummaryAccumulator') -> 'SummaryAccumulator':
+        for key, accumulator in other.metrics.items():
+            if key in self.metrics:
+                self.metrics[key].merge(accumulator)
+            else:
+                self.metrics[key] = MetricAccumulator(axial=key in AXIAL_METRICS).merge(accumulator)
+        return self
+
+    def rows(self) -> list:
+        """One dict per metric with Metric, Mean, Std, Min, Max and Median"""
+        return [{'Metric': key, **accumulator.summary()} for key, accumulator in self.metrics.items()]
+
+
+def merge_all(accumulators: Iterable[SummaryAccumulator]) -> SummaryAccumulator:
+    """Reduce partial summaries (e.g. one per worker or per frame) into one"""
+    return reduce(SummaryAccumulator.merge, accumulators, SummaryAccumulator())
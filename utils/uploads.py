@@ -0,0 +1,127 @@
+import os
+import shutil
+import tempfile
+import weakref
+
+import numpy as np
+from PIL import Image
+
+# Bytes copied per read when spilling an upload to disk
+CHUNK_SIZE = 8 * 1024 * 1024
+
+# PIL raw modes that map one-to-one onto a numpy dtype
+RAW_DTYPES = {
+    'L': np.uint8,
+    'I;16': np.dtype('<u2'),
+    'I;16B': np.dtype('>u2'),
+    'I;16L': np.dtype('<u2'),
+    'F;32F': np.dtype('<f4'),
+    'F;32BF': np.dtype('>f4'),
+}
+
+
+class UploadSpooler:
+    """Spill uploaded files to a per-session temp directory and open them lazily"""
+
+    def __init__(self, prefix: str = "polarvision_"):
+        self.directory = tempfile.mkdtemp(prefix=prefix)
+        self._paths = {}
+        # Removes the directory when the session state drops the spooler or the process exits
+        self._finalizer = weakref.finalize(self, shutil.rmtree, self.directory, True)
+
+    def spool(self, uploaded_file) -> str:
+        """Copy an uploaded file to disk in chunks and return its path"""
+        name = os.path.basename(getattr(uploaded_file, 'name', 'upload'))
+        key = getattr(uploaded_file, 'file_id', None)
+        if key is not None and key in self._paths:
+            return self._paths[key]
+
+        # A fresh file per upload so arrays still mapping an older spool are never overwritten
+        fd, path = tempfile.mkstemp(suffix='_' + name, dir=self.directory)
+        uploaded_file.seek(0)
+        with os.fdopen(fd, 'wb') as fh:
+            shutil.copyfileobj(uploaded_file, fh, CHUNK_SIZE)
+        if key is not None:
+            self._paths[key] = path
+        return path
+
+    def retain(self, keys) -> None:
+        """Delete spooled files whose upload is no longer in ``keys``.
+
+        Arrays that still map a deleted file keep reading it; its disk space is
+        released once the last job holding such an array lets go of it.
+        """
+        keep = set(keys)
+        for key in [key for key in self._paths if key not in keep]:
+            try:
+                os.remove(self._paths[key])
+            except FileNotFoundError:
+                pass
+            except OSError:
+                # Still open elsewhere (e.g. mapped on Windows); try again on the next call
+                continue
+            del self._paths[key]
+
+    def load(self, uploaded_file) -> np.ndarray:
+        """Spool an upload and return it as a grayscale array"""
+        return load_grayscale(self.spool(uploaded_file))
+
+    def cleanup(self):
+        """Delete all spooled files now"""
+        self._finalizer()
+
+
+def memmap_image(path: str):
+    """Memory-map an uncompressed single-channel image, or return None if it is not mappable"""
+    if path.lower().endswith('.npy'):
+        data = np.load(path, mmap_mode='r')
+        if data.ndim != 2:
+            raise ValueError(f"{os.path.basename(path)} holds a {data.ndim}D array; expected one 2D frame")
+        return data
+
+    with Image.open(path) as img:
+        if len(img.tile) != 1:
+            return None
+        decoder, extents, offset, args = img.tile[0]
+        if decoder != 'raw':
+            return None
+        rawmode, stride, orientation = args if isinstance(args, tuple) else (args, 0, 1)
+        dtype = RAW_DTYPES.get(rawmode)
+        width, height = img.size
+        if dtype is None or tuple(extents) != (0, 0, width, height):
+            return None
+
+    dtype = np.dtype(dtype)
+    row_bytes = width * dtype.itemsize
+    if stride not in (0, row_bytes) and stride < row_bytes:
+        return None
+    stride = stride or row_bytes
+    if stride % dtype.itemsize:
+        return None
+
+    rows = np.memmap(path, dtype=dtype, mode='r', offset=offset,
+                     shape=(height, stride // dtype.itemsize))
+    rows = rows[:, :width]
+    # Bottom-up bitmaps (BMP) store the last row first
+    return rows[::-1] if orientation == -1 else rows
+
+
+def image_to_array(img: Image.Image) -> np.ndarray:
+    """Grayscale float32 pixels; 16-bit and float images keep their range, everything else becomes 8-bit"""
+    page = img if img.mode in ('I;16', 'I;16B', 'I;16L', 'I', 'F') else img.convert('L')
+    return np.array(page, dtype=np.float32)
+
+
+def load_grayscale(path: str) -> np.ndarray:
+    """Load an image as a 2D array, memory-mapped when the format allows it.
+
+    Raises ValueError for files that are not a single readable 2D frame.
+    """
+    try:
+        mapped = memmap_image(path)
+        if mapped is not None:
+            return mapped
+        with Image.open(path) as img:
+            return image_to_array(img)
+    except (OSError, SyntaxError, Image.DecompressionBombError) as exc:
+        raise ValueError(f"Cannot read {os.path.basename(path)} as an image: {exc}") from exc
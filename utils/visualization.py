@@ -22,17 +22,41 @@ class PolarizationVisualizer:
                    [{}, {}, {}]]
         )
         
-        # DOP
-        fig.add_trace(go.Heatmap(z=metrics['dop'], colorscale='hot', showscale=False), row=1, col=1)
-        # Orientation Angle
-        fig.add_trace(go.Heatmap(z=metrics['orientation_angle'], colorscale='hsv', showscale=False), row=1, col=2)
-        # Ellipticity Angle
-        fig.add_trace(go.Heatmap(z=metrics['ellipticity_angle'], colorscale='RdYlBu', showscale=False), row=1, col=3)
-        # S0
-        fig.add_trace(go.Heatmap(z=metrics['S0'], colorscale='gray', showscale=False), row=2, col=1)
-        # S1
-        fig.add_trace(go.Heatmap(z=metrics['S1'], colorscale='rdbu', showscale=False), row=2, col=2)
-        fig.add_trace(go.Heatmap(z=metrics['S2'], colorscale='picnic', showscale=False), row=2, col=3)
+        panels = [
+            ('dop', 'hot', 1, 1),                       # DOP
+            ('orientation_angle', 'hsv', 1, 2),         # Orientation Angle
+            ('ellipticity_angle', 'RdYlBu', 1, 3),      # Ellipticity Angle
+            ('S0', 'gray', 2, 1),                       # S0
+            ('S1', 'rdbu', 2, 2),                       # S1
+            ('S2', 'picnic', 2, 3),                     # S2
+        ]
+        for key, colorscale, row, col in panels:
+            data = metrics.get(key)
+            if data is None:
+                # Not measured (e.g. S2 in dual-image mode): label the empty panel instead
+                fig.add_annotation(text="Not measured", showarrow=False, font=dict(color='gray'),
+                                   xref='x domain', yref='y domain', x=0.5, y=0.5, row=row, col=col)
+                continue
+            fig.add_trace(go.Heatmap(z=data, colorscale=colorscale, showscale=False), row=row, col=col)
         
         fig.update_layout(height=600, showlegend=False, title_text="Polarization Analysis Dashboard")
-        return fig
\ No newline at end of file
+        return fig
+    
+    @staticmethod
+    def create_history_trend(daily: list, metric: str):
+        """Daily mean of a metric across runs, with the spread of per-run means as a band (linear metrics only)"""
+        days = [row['day'] for row in daily]
+        fig = go.Figure()
+        if any(row['highest_mean'] is not None for row in daily):
+            fig.add_trace(go.Scatter(x=days, y=[row['highest_mean'] for row in daily], mode='lines',
+                                     line=dict(width=0), showlegend=False, hoverinfo='skip'))
+            fig.add_trace(go.Scatter(x=days, y=[row['lowest_mean'] for row in daily], mode='lines',
+                                     line=dict(width=0), fill='tonexty', fillcolor='rgba(102,126,234,0.2)',
+                                     name='Range of run means'))
+        fig.add_trace(go.Scatter(x=days, y=[row['mean'] for row in daily], mode='lines+markers',
+                                 line=dict(color='#00ff88'), name='Daily mean',
+                                 customdata=[row['runs'] for row in daily],
+                                 hovertemplate='%{x}<br>%{y:.4g} over %{customdata} runs<extra></extra>'))
+        fig.update_layout(height=400, title_text=f"{metric} — daily trend", xaxis_title="Day (UTC)",
+                          yaxis_title=metric)
+        return fig
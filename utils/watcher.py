@@ -0,0 +1,193 @@
+import json
+import os
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from utils.file_handling import FileExporter
+from utils.polarization import PolarizationProcessor
+from utils.uploads import load_grayscale
+
+try:
+    from inotify_simple import INotify, flags as inotify_flags
+except ImportError:  # polling fallback
+    INotify = None
+
+ANGLES = (0, 45, 90, 135)
+FILE_PATTERN = re.compile(
+    r'^(?P<prefix>.*)polarization_(?P<angle>0|45|90|135)deg\.(?:png|jpe?g|tiff?|bmp|npy)$',
+    re.IGNORECASE
+)
+INDEX_FILENAME = '.polarization_index.json'
+
+
+class ProcessedIndex:
+    """Persistent record of angle sets that have already been processed"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._entries = {}
+        if os.path.exists(path):
+            with open(path) as fh:
+                self._entries = json.load(fh)
+
+    def __contains__(self, item) -> bool:
+        set_id, signature = item
+        with self._lock:
+            return self._entries.get(set_id, {}).get('signature') == signature
+
+    def mark(self, set_id: str, signature: str, outputs: list):
+        """Record a finished set and atomically rewrite the index file"""
+        with self._lock:
+            self._entries[set_id] = {
+                'signature': signature,
+                'outputs': outputs,
+                'processed_at': time.time()
+            }
+            tmp_path = self.path + '.tmp'
+            with open(tmp_path, 'w') as fh:
+                json.dump(self._entries, fh, indent=1)
+            os.replace(tmp_path, self.path)
+
+
+class FolderWatcher:
+    """Watch a directory for complete polarization angle sets and process each exactly once"""
+
+    def __init__(self, input_dir: str, output_dir: str = None, workers: int = 2,
+                 poll_interval: float = 2.0, settle_time: float = 1.0):
+        self.input_dir = os.path.abspath(input_dir)
+        self.output_dir = os.path.abspath(output_dir) if output_dir else None
+        self.poll_interval = poll_interval
+        self.settle_time = settle_time
+        index_root = self.output_dir or self.input_dir
+        os.makedirs(index_root, exist_ok=True)
+        self.index = ProcessedIndex(os.path.join(index_root, INDEX_FILENAME))
+        self._executor = ThreadPoolExecutor(max_workers=workers)
+        self._in_flight = set()
+        # Signature each failed set had when it failed; retried only once its files change
+        self._failed = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+
+    def find_complete_sets(self) -> dict:
+        """Group files by directory and prefix, keeping only sets with all four angles"""
+        groups = {}
+        for root, _dirs, files in os.walk(self.input_dir):
+            rel_dir = os.path.relpath(root, self.input_dir)
+            for name in files:
+                match = FILE_PATTERN.match(name)
+                if match:
+                    # Trailing separator kept for unprefixed sets so dirname/basename split cleanly
+                    set_id = os.path.join(rel_dir, match.group('prefix'))
+                    groups.setdefault(set_id, {})[int(match.group('angle'))] = os.path.join(root, name)
+        return {set_id: files for set_id, files in groups.items() if len(files) == len(ANGLES)}
+
+    def _signature(self, files: dict):
+        """Size/mtime fingerprint, or None while any file is still being written"""
+        parts = []
+        now = time.time()
+        for angle in ANGLES:
+            try:
+                stat = os.stat(files[angle])
+            except FileNotFoundError:
+                return None
+            if now - stat.st_mtime < self.settle_time:
+                return None
+            parts.append(f"{angle}:{stat.st_size}:{stat.st_mtime_ns}")
+        return '|'.join(parts)
+
+    def scan(self) -> int:
+        """Submit every new complete set to the worker pool; returns the number submitted"""
+        submitted = 0
+        for set_id, files in self.find_complete_sets().items():
+            signature = self._signature(files)
+            if signature is None or (set_id, signature) in self.index:
+                continue
+            with self._lock:
+                if set_id in self._in_flight or self._failed.get(set_id) == signature:
+                    continue
+                self._in_flight.add(set_id)
+            future = self._executor.submit(self.process_set, set_id, files, signature)
+            future.add_done_callback(lambda _f, set_id=set_id: self._finish(set_id))
+            submitted += 1
+        return submitted
+
+    def _finish(self, set_id: str):
+        with self._lock:
+            self._in_flight.discard(set_id)
+
+    def _output_prefix(self, set_id: str, files: dict) -> str:
+        if self.output_dir is None:
+            directory = os.path.dirname(files[0])
+        else:
+            directory = os.path.join(self.output_dir, os.path.dirname(set_id))
+        os.makedirs(directory, exist_ok=True)
+        return os.path.join(directory, os.path.basename(set_id))
+
+    def process_set(self, set_id: str, files: dict, signature: str) -> list:
+        """Compute metrics for one angle set and write them next to the inputs"""
+        try:
+            images = [load_grayscale(files[angle]) for angle in ANGLES]
+            stokes = PolarizationProcessor.compute_stokes_single(images)
+            metrics = PolarizationProcessor.compute_polarization_metrics(stokes)
+
+            prefix = self._output_prefix(set_id, files)
+            metrics_path = prefix + 'polarization_metrics.npz'
+            stats_path = prefix + 'polarization_stats.csv'
+            np.savez_compressed(metrics_path, **{key: value for key, value in metrics.items() if value is not None})
+            FileExporter.create_summary_statistics(metrics).to_csv(stats_path, index=False)
+        except Exception as exc:
+            # Left out of the index, but skipped until one of its files is rewritten
+            with self._lock:
+                self._failed[set_id] = signature
+            print(f"❌ {set_id}: {exc}")
+            return []
+
+        with self._lock:
+            self._failed.pop(set_id, None)
+
+        outputs = [metrics_path, stats_path]
+        self.index.mark(set_id, signature, outputs)
+        print(f"✅ {set_id}: {', '.join(os.path.basename(p) for p in outputs)}")
+        return outputs
+
+    def _wait_for_changes(self, inotify):
+        if inotify is None:
+            self._stop.wait(self.poll_interval)
+            return
+        # Keep polling as a backstop: files must also settle before they are picked up
+        inotify.read(timeout=int(self.poll_interval * 1000))
+
+    def _open_inotify(self):
+        if INotify is None:
+            return None
+        inotify = INotify()
+        mask = inotify_flags.CLOSE_WRITE | inotify_flags.MOVED_TO | inotify_flags.CREATE
+        for root, _dirs, _files in os.walk(self.input_dir):
+            inotify.add_watch(root, mask)
+        return inotify
+
+    def run(self):
+        """Scan until stop() is called"""
+        inotify = self._open_inotify()
+        mode = 'inotify' if inotify is not None else f'polling every {self.poll_interval:g}s'
+        print(f"👀 Watching {self.input_dir} ({mode})")
+        try:
+            while not self._stop.is_set():
+                self.scan()
+                self._wait_for_changes(inotify)
+        finally:
+            if inotify is not None:
+                inotify.close()
+            self.close()
+
+    def stop(self):
+        self._stop.set()
+
+    def close(self):
+        """Wait for in-flight sets to finish and release the worker pool"""
+        self._executor.shutdown(wait=True)
@@ -0,0 +1,42 @@
+import argparse
+import signal
+
+from utils.watcher import FolderWatcher
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Watch a folder for polarization_{angle}deg image sets and process each one once"
+    )
+    parser.add_argument("input_dir", help="Directory the capture rigs write into")
+    parser.add_argument("--output-dir", default=None,
+                        help="Write metrics and stats here instead of next to the inputs")
+    parser.add_argument("--workers", type=int, default=2, help="Maximum sets processed in parallel")
+    parser.add_argument("--poll-interval", type=float, default=2.0, help="Seconds between scans")
+    parser.add_argument("--settle-time", type=float, default=1.0,
+                        help="Seconds a file must be unchanged before it is considered complete")
+    parser.add_argument("--once", action="store_true", help="Process what is there now and exit")
+    args = parser.parse_args()
+
+    watcher = FolderWatcher(
+        args.input_dir,
+        output_dir=args.output_dir,
+        workers=args.workers,
+        poll_interval=args.poll_interval,
+        settle_time=args.settle_time
+    )
+
+    if args.once:
+        watcher.scan()
+        watcher.close()
+        return
+
+    signal.signal(signal.SIGTERM, lambda *_: watcher.stop())
+    try:
+        watcher.run()
+    except KeyboardInterrupt:
+        watcher.stop()
+
+
+if __name__ == "__main__":
+    main()